@@ -0,0 +1,83 @@
+"""
+Resident persona agents.
+
+An Agent is built once per persona and keeps its model config in memory; its system
+prompt comes from the in-memory prompt registry, so a turn is just the LLM call:
+reply(history) returns the cleaned text and speak() also appends it to the shared
+history. run.py and simulation_stream use these instead of exec'ing the agent_*.py
+scripts, which are now thin per-persona entry points.
+"""
+import re
+import threading
+
+import utils
+from circuit_breaker import call_with_fallback
+from history_store import get_store
+from summary_memory import get_memory
+
+# Persona key -> role name used in the history
+PERSON_ROLE = {
+    "Gaurav_Atavale": "Gaurav",
+    "Anagha_Palandye": "Anagha",
+    "Kanishkha_S": "Kanishkha",
+    "Nirbhay_R": "Nirbhay",
+}
+ROLE_PERSON = {v: k for k, v in PERSON_ROLE.items()}
+
+REPLY_MODEL_PRIMARY = "claude-sonnet-4-5-20250929"
+REPLY_MODEL_FALLBACK = "llama-3.1-8b-instant"
+
+# Models often start with "Name:" even when asked not to
+_SPEAKER_PREFIX_RE = re.compile(r"^[^:\n]+\s*:\s*")
+
+
+class Agent:
+    """One persona: models configured once, prompts served from the registry, reused for every turn."""
+
+    def __init__(self, person_name, role=None, primary_model=REPLY_MODEL_PRIMARY,
+                 fallback_model=REPLY_MODEL_FALLBACK):
+        self.person_name = person_name
+        self.role = role or PERSON_ROLE[person_name]
+        self.primary_model = primary_model
+        self.fallback_model = fallback_model
+
+    @property
+    def sys_prompt(self):
+        # From the prompt registry: in memory, picks up edits to config/ without a restart
+        return utils.build_agent_sys_prompt(self.person_name)
+
+    def reply(self, history=None):
+        """
+        Next message for this persona given the formatted conversation `history`
+        (default: the newest entries within the "reply" token budget). Returns the text;
+        nothing is stored.
+        """
+        if history is None:
+            history = utils.format_history_for("reply")
+        # Skips straight to the fallback while the primary model's circuit breaker is open
+        text = call_with_fallback(
+            self.primary_model, self.fallback_model,
+            lambda model: utils.agent_sim(model, self.sys_prompt, history, profile="reply"),
+        )
+        return _SPEAKER_PREFIX_RE.sub("", text, count=1)
+
+    def speak(self, history=None):
+        """Reply and append the message to the shared history; returns the stored entry."""
+        entry = get_store().append(self.role, self.reply(history))
+        # Folds aged-out messages into the running summary in the background
+        get_memory().maybe_update()
+        return entry
+
+
+_agents = {}
+_agents_lock = threading.Lock()
+
+
+def get_agent(person_name):
+    """Process-wide Agent for a persona, built on first use."""
+    with _agents_lock:
+        agent = _agents.get(person_name)
+        if agent is None:
+            agent = Agent(person_name)
+            _agents[person_name] = agent
+        return agent
@@ -0,0 +1,197 @@
+"""
+Bidding phase shared by run.py and simulation_stream.
+
+Every eligible persona's bid is requested at the same time on a bounded thread pool,
+so a round costs roughly the slowest bid instead of the sum of all of them. Bids that
+miss the per-round deadline (or fail on both models) get DEFAULT_BID and are reported
+in the caller's `missed` set, so a round lost to a slow provider can be skipped
+instead of read as "everyone is out of credits".
+
+BID_MODE selects how scores are produced:
+- "per_persona" (default): one LLM call per persona.
+- "batch": one LLM call scores every eligible persona (history and instructions sent
+  once) within BATCH_DEADLINE_SHARE of the deadline; personas missing from a late or
+  malformed answer fall back to per-persona calls in the rest of it.
+- "local": no LLM at all; local_bidder scores personas by TF-IDF similarity to the history.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import utils
+from circuit_breaker import call_with_fallback
+
+BID_MODEL_PRIMARY = "claude-3-5-sonnet-20240620"
+BID_MODEL_FALLBACK = "llama-3.1-8b-instant"
+
+# Seconds the whole bidding phase may take before missing bids get DEFAULT_BID
+BID_DEADLINE_SECONDS = float(os.environ.get("BID_DEADLINE_SECONDS", "20"))
+BID_MAX_WORKERS = int(os.environ.get("BID_MAX_WORKERS", "8"))
+DEFAULT_BID = 0
+# Consecutive rounds in which every bid is 0 only because bids were missed before the run gives up
+MAX_MISSED_ROUNDS = int(os.environ.get("MAX_MISSED_ROUNDS", "3"))
+# Pause before re-bidding after such a round, doubled for each one in a row
+MISSED_ROUND_BACKOFF_SECONDS = float(os.environ.get("MISSED_ROUND_BACKOFF_SECONDS", "5"))
+
+BID_MODE_PER_PERSONA = "per_persona"
+BID_MODE_BATCH = "batch"
+BID_MODE_LOCAL = "local"
+BID_MODE = os.environ.get("BID_MODE", BID_MODE_PER_PERSONA)
+# Fraction of the round deadline the batched call may use before falling back per persona
+BATCH_DEADLINE_SHARE = 0.5
+
+_executor = ThreadPoolExecutor(max_workers=BID_MAX_WORKERS, thread_name_prefix="bid")
+# Bids past their deadline that were already running: they hold a worker until their own timeout
+_abandoned = set()
+_abandoned_lock = threading.Lock()
+
+
+def score_to_bid(llm_bid_score, person_name, credits_left):
+    """generate_bid_score_each_user outputs percentage likelihood. It has to be scaled by credit left."""
+    return int(0.01 * float(json.loads(llm_bid_score)["score"]) * credits_left[person_name])
+
+
+def bid_for_person(person_name, credits_left, primary_model=BID_MODEL_PRIMARY, fallback_model=BID_MODEL_FALLBACK):
+    """
+    Bid with the primary model, falling back to the second model on error or while its breaker is open.
+    A malformed score also falls back, but is not counted against the primary's breaker.
+    """
+    def bid_with(model_LLM):
+        return utils.generate_bid_score_each_user(person_name, credits_left, model_LLM)
+
+    def parse(llm_bid_score):
+        return score_to_bid(llm_bid_score, person_name, credits_left)
+
+    return call_with_fallback(primary_model, fallback_model, bid_with, parse)
+
+
+def batch_bids(persons, credits_left, primary_model=BID_MODEL_PRIMARY, fallback_model=BID_MODEL_FALLBACK):
+    """Score all `persons` in one call (fallback model on error). Returns {person: bid} for the ones answered."""
+    def batch_with(model_LLM):
+        return utils.generate_bid_scores_batch(persons, credits_left, model_LLM)
+
+    def parse(scores):
+        if not scores:
+            raise ValueError("malformed batched bid")
+        return scores
+
+    try:
+        scores = call_with_fallback(primary_model, fallback_model, batch_with, parse)
+    except Exception as e:
+        print(f"Warning: batched bid failed on both models: {e}")
+        scores = {}
+    return {person: int(0.01 * score * credits_left[person]) for person, score in scores.items()}
+
+
+def local_bids(persons, credits_left):
+    """Score `persons` with the TF-IDF local bidder. Returns {person: bid}."""
+    import local_bidder
+
+    # Message text only: role prefixes and the summary header would skew the similarity
+    scores = local_bidder.get_bidder().scores(utils.history_content_for("bid"), persons)
+    return {person: int(0.01 * scores.get(person, 0) * credits_left[person]) for person in persons}
+
+
+def round_missed(bids, missed):
+    """True if every bid is 0 only because some bids were missed: skip the round, the game is not over."""
+    return bool(missed) and all(v == 0 for v in bids.values())
+
+
+def _abandon(future):
+    """Drop a late bid. A running one cannot be cancelled; remember it until it frees its worker."""
+    if not future.cancel():
+        with _abandoned_lock:
+            _abandoned.add(future)
+
+
+def backoff_after_missed_round(missed_rounds):
+    """
+    Pause before re-bidding after the `missed_rounds`-th missed round in a row: exponential
+    backoff, and at least until abandoned bids have given their workers back (bounded by one
+    deadline), so the next round's bids do not queue behind them.
+    """
+    delay = MISSED_ROUND_BACKOFF_SECONDS * 2 ** max(0, missed_rounds - 1)
+    started = time.monotonic()
+    with _abandoned_lock:
+        _abandoned.difference_update([f for f in _abandoned if f.done()])
+        pending = list(_abandoned)
+    if pending:
+        wait(pending, timeout=max(delay, BID_DEADLINE_SECONDS))
+    remaining = delay - (time.monotonic() - started)
+    if remaining > 0:
+        time.sleep(remaining)
+
+
+def _await_bids(futures, bids, deadline, missed):
+    """Wait up to `deadline` seconds for {future: person}; fill `bids` with results or DEFAULT_BID."""
+    done, not_done = wait(futures, timeout=max(0.0, deadline))
+    for future in done:
+        person = futures[future]
+        try:
+            bids[person] = future.result()
+        except Exception as e:
+            print(f"Warning: bid failed for {person}: {e}. Using default bid {DEFAULT_BID}.")
+            bids[person] = DEFAULT_BID
+            missed.add(person)
+    for future in not_done:
+        person = futures[future]
+        _abandon(future)
+        print(f"Warning: bid for {person} missed the {deadline:g}s deadline. Using default bid {DEFAULT_BID}.")
+        bids[person] = DEFAULT_BID
+        missed.add(person)
+
+
+def collect_bids(persons, credits_left, primary_model=BID_MODEL_PRIMARY, fallback_model=BID_MODEL_FALLBACK,
+                 deadline=None, mode=None, missed=None):
+    """
+    Run one bidding phase concurrently. Returns {person: bid} for every person in `persons`;
+    people with no credits bid 0, late or failed bids get DEFAULT_BID and are added to
+    `missed` (a set) if one is given.
+    """
+    if missed is None:
+        missed = set()
+    if deadline is None:
+        deadline = BID_DEADLINE_SECONDS
+    if mode is None:
+        mode = BID_MODE
+    # Snapshot so the workers all see the same credits even if the caller mutates its dict
+    credits_snapshot = dict(credits_left)
+    bids = {person: 0 for person in persons}
+    eligible = [person for person in persons if credits_snapshot.get(person, 0) > 0]
+    if not eligible:
+        return bids
+
+    started = time.monotonic()
+    if mode == BID_MODE_LOCAL:
+        bids.update(local_bids(eligible, credits_snapshot))
+        print(f"Bidding phase took {time.monotonic() - started:.4f}s for {len(eligible)} bids ({mode}).")
+        return bids
+
+    pending = eligible
+    if mode == BID_MODE_BATCH:
+        future = _executor.submit(batch_bids, eligible, credits_snapshot, primary_model, fallback_model)
+        try:
+            # Only part of the deadline, so the per-persona fallback below still has time to run
+            batch = future.result(timeout=deadline * BATCH_DEADLINE_SHARE)
+        except Exception as e:
+            if not future.done():
+                _abandon(future)
+            reason = str(e) or "missed its share of the deadline"
+            print(f"Warning: batched bid unavailable ({reason}); bidding per persona.")
+            batch = {}
+        bids.update(batch)
+        pending = [person for person in eligible if person not in batch]
+        if pending and batch:
+            print(f"Warning: batched bid missed {pending}; bidding for them individually.")
+
+    if pending:
+        futures = {
+            _executor.submit(bid_for_person, person, credits_snapshot, primary_model, fallback_model): person
+            for person in pending
+        }
+        _await_bids(futures, bids, deadline - (time.monotonic() - started), missed)
+    print(f"Bidding phase took {time.monotonic() - started:.2f}s for {len(eligible)} bids ({mode}).")
+    return bids
+
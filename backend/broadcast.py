@@ -0,0 +1,149 @@
+"""
+Single-watcher broadcast hub for /api/history/stream.
+
+One background thread follows the history (history_store.follow) and every event,
+whether a new history line or an in-process simulation event, is serialised once and
+fanned out on the server's event loop to one asyncio.Queue per SSE subscriber.
+A viewer therefore costs one queue, not one threadpool thread plus its own polling.
+
+The watcher polls every HISTORY_POLL_SECONDS, which picks up lines written by a run.py
+subprocess. The in-process simulation calls notify() after each reply is appended, so
+its lines go out immediately instead of on the next poll.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from history_store import get_store
+
+HISTORY_POLL_SECONDS = float(os.environ.get("HISTORY_POLL_SECONDS", "0.5"))
+# Per-subscriber backlog; a client that falls this far behind loses its oldest events
+SUBSCRIBER_QUEUE_SIZE = 1000
+# Seconds without events before a keep-alive comment is sent (also detects closed clients)
+KEEPALIVE_SECONDS = 15.0
+LATENCY_WINDOW = 500
+
+
+def format_sse(ev):
+    return f"data: {json.dumps(ev)}\n\n"
+
+
+def _message_event(entry):
+    return {
+        "type": "message",
+        "seq": entry["seq"],
+        "role": entry.get("role", ""),
+        "content": entry.get("content", ""),
+        "timestamp": entry.get("timestamp"),
+    }
+
+
+class BroadcastHub:
+    """Fans events out to asyncio subscriber queues. publish() is safe from any thread."""
+
+    def __init__(self, poll_seconds=HISTORY_POLL_SECONDS, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        self._loop = None
+        self._subscribers = set()  # only touched on the event loop thread
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._stats = {"published": 0, "delivered": 0, "dropped": 0, "peak_subscribers": 0}
+
+    def start(self, loop):
+        """Bind to the server's event loop and start the history watcher thread."""
+        self._loop = loop
+        if self._watcher is None or not self._watcher.is_alive():
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch_history, name="history-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def notify(self):
+        """Tell the watcher the history just changed, so it does not wait for the next poll."""
+        self._wake.set()
+
+    def publish(self, ev):
+        """Serialise `ev` once and queue it for every subscriber."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._fanout, format_sse(ev), time.monotonic())
+        except RuntimeError:
+            pass  # loop is shutting down
+
+    def _fanout(self, payload, published_at):
+        self._stats["published"] += 1
+        item = (published_at, payload)
+        for q in self._subscribers:
+            if q.full():
+                q.get_nowait()
+                self._stats["dropped"] += 1
+            q.put_nowait(item)
+
+    def _watch_history(self):
+        history = get_store()
+        cursor = None
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                entries, cursor = history.follow(cursor)
+                for entry in entries:
+                    self.publish(_message_event(entry))
+            except Exception as e:
+                # Any backend error (sqlite3.OperationalError, a half-written sidecar, ...) must not
+                # kill the only watcher; keep polling from the same cursor
+                print(f"Warning: history watcher could not read history: {e!r}")
+            self._wake.wait(self.poll_seconds)
+
+    def subscribe(self):
+        """New subscriber queue (call on the event loop)."""
+        q = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(q)
+        self._stats["peak_subscribers"] = max(self._stats["peak_subscribers"], len(self._subscribers))
+        return q
+
+    def unsubscribe(self, q):
+        self._subscribers.discard(q)
+
+    async def stream(self):
+        """Async generator of SSE payloads for one client, published after it connected."""
+        q = self.subscribe()
+        try:
+            while True:
+                try:
+                    published_at, payload = await asyncio.wait_for(q.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                self._latencies.append(time.monotonic() - published_at)
+                self._stats["delivered"] += 1
+                yield payload
+        finally:
+            self.unsubscribe(q)
+
+    def stats(self):
+        """Subscriber count, event counters and publish-to-delivery latency (ms)."""
+        samples = sorted(self._latencies)
+
+        def pct(p):
+            if not samples:
+                return None
+            return round(1000 * samples[min(len(samples) - 1, int(p / 100.0 * len(samples)))], 3)
+
+        stats = dict(self._stats)
+        stats["subscribers"] = len(self._subscribers)
+        stats["fanout_latency_ms"] = {"p50": pct(50), "p95": pct(95), "max": pct(100), "samples": len(samples)}
+        return stats
+
+
+hub = BroadcastHub()
@@ -0,0 +1,143 @@
+"""
+Per-model circuit breakers for the primary -> fallback model switch.
+
+Without a breaker, every bid and reply first waits for a failing primary model before
+trying the fallback. A breaker opens after BREAKER_FAILURE_THRESHOLD consecutive
+failures and sends traffic straight to the fallback for BREAKER_COOLDOWN_SECONDS.
+After the cooldown one half-open probe is let through to the primary: success closes
+the breaker again, failure re-opens it for another cooldown.
+"""
+import os
+import threading
+import time
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get("BREAKER_COOLDOWN_SECONDS", "60"))
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one model. Safe to share across threads."""
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown_seconds=BREAKER_COOLDOWN_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.total_failures = 0
+        self.total_successes = 0
+        self.short_circuited = 0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """True if a call to this model should be attempted now."""
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= self.cooldown_seconds:
+                self.state = STATE_HALF_OPEN
+            if self.state == STATE_HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.total_successes += 1
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+            if self.state != STATE_CLOSED:
+                print(f"Circuit breaker for {self.name} closed (probe succeeded).")
+            self.state = STATE_CLOSED
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            was_probe = self.state == STATE_HALF_OPEN
+            self.probe_in_flight = False
+            if was_probe or (self.state == STATE_CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = STATE_OPEN
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+                print(f"Circuit breaker for {self.name} opened after {self.consecutive_failures} consecutive failures.")
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == STATE_OPEN:
+                retry_in = max(0.0, self.cooldown_seconds - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "cooldown_seconds": self.cooldown_seconds,
+                "retry_in_seconds": retry_in,
+                "total_failures": self.total_failures,
+                "total_successes": self.total_successes,
+                "short_circuited": self.short_circuited,
+                "times_opened": self.times_opened,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(model_LLM):
+    """Process-wide breaker for a model name."""
+    with _breakers_lock:
+        breaker = _breakers.get(model_LLM)
+        if breaker is None:
+            breaker = CircuitBreaker(model_LLM)
+            _breakers[model_LLM] = breaker
+        return breaker
+
+
+def breaker_states():
+    """{model: snapshot} for every model that has been called."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+
+def call_with_fallback(primary_model, fallback_model, fn, parse=None):
+    """
+    Return fn(primary_model), or fn(fallback_model) if the primary fails or its breaker is open.
+    Both outcomes are recorded on the models' breakers. The fallback is always attempted,
+    since it is the last resort; its errors propagate to the caller.
+    parse(result), if given, turns the raw answer into the return value. It runs outside the
+    breakers: a model that answered badly is up, so a parse error is not recorded as a failure,
+    it only sends the call on to the fallback.
+    """
+    primary = get_breaker(primary_model)
+    if primary.allow_request():
+        try:
+            result = fn(primary_model)
+        except Exception:
+            primary.record_failure()
+        else:
+            primary.record_success()
+            if parse is None:
+                return result
+            try:
+                return parse(result)
+            except Exception as e:
+                print(f"Warning: unusable answer from {primary_model}: {e}")
+    fallback = get_breaker(fallback_model)
+    try:
+        result = fn(fallback_model)
+    except Exception:
+        fallback.record_failure()
+        raise
+    fallback.record_success()
+    return result if parse is None else parse(result)
@@ -0,0 +1,197 @@
+"""
+Hedged LLM requests driven by observed latency percentiles.
+
+Provider latency has a long tail, and one slow bid stalls the whole auction round.
+Every agent_sim call records its latency per model. With hedging on, once a call has
+been running longer than that model's rolling p95, a second request is sent (to the
+same model or a designated hedge model). The first valid response wins; the loser is
+told to stop through its cancel event, whose callbacks shut its HTTP response down so
+the worker is freed even while it waits for the next token.
+
+Enable with LLM_HEDGE=1 or agent_sim(..., hedge=True). Stats (hedge rate, wins, and
+hedge_delay_seconds: the total time hedge winners waited before launching, i.e. the
+p95 delays paid) are served at /api/llm/hedging. The latency actually saved is not
+known, since the cancelled primary's finish time is never observed.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+HEDGE_ENABLED = os.environ.get("LLM_HEDGE", "").strip().lower() in ("1", "true", "yes")
+# Rolling window of latencies per model, and how many are needed before p95 is trusted. A primary
+# cancelled because its hedge won is recorded with its elapsed time at cancel (a censored sample:
+# it would have taken at least that long), otherwise the slow tail never lands and p95 drifts down.
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+HEDGE_PERCENTILE = 95
+HEDGE_MAX_WORKERS = int(os.environ.get("HEDGE_MAX_WORKERS", "16"))
+
+_executor = ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="hedge")
+
+
+class HedgeCancelled(Exception):
+    """Raised inside a request that lost the race and was told to stop."""
+
+
+class CancelEvent(threading.Event):
+    """threading.Event that also runs the callbacks registered with on_cancel when it is set."""
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def on_cancel(self, callback):
+        """Run callback() when the event is set, or straight away if it already is."""
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set(self):
+        with self._callbacks_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Warning: hedge cancel callback failed: {e}")
+
+
+class LatencyTracker:
+    """Rolling latency samples for one model."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        """Nearest-rank percentile, or None until MIN_SAMPLES latencies have been seen."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        rank = max(0, min(len(samples) - 1, int(round(pct / 100.0 * len(samples))) - 1))
+        return samples[rank]
+
+    def count(self):
+        with self._lock:
+            return len(self._samples)
+
+
+_trackers = {}
+_lock = threading.Lock()
+_stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0, "censored": 0, "hedge_delay_seconds": 0.0}
+
+
+def get_tracker(model_LLM):
+    with _lock:
+        tracker = _trackers.get(model_LLM)
+        if tracker is None:
+            tracker = LatencyTracker()
+            _trackers[model_LLM] = tracker
+        return tracker
+
+
+def record_latency(model_LLM, seconds):
+    get_tracker(model_LLM).record(seconds)
+
+
+def _bump(key, amount=1):
+    with _lock:
+        _stats[key] += amount
+
+
+def _run_attempt(model_LLM, fn, cancel_event):
+    started = time.monotonic()
+    result = fn(model_LLM, cancel_event)
+    # A cancelled loser was already recorded (or deliberately skipped) by hedged_call
+    if not cancel_event.is_set():
+        record_latency(model_LLM, time.monotonic() - started)
+    return result
+
+
+def hedged_call(model_LLM, fn, hedge_model=None, is_valid=None):
+    """
+    Call fn(model, cancel_event) and hedge it past the model's p95 latency.
+    fn must stop (raising HedgeCancelled) soon after cancel_event (a CancelEvent) is set;
+    it can register cleanup with cancel_event.on_cancel to be woken from a blocking read. is_valid(result)
+    may reject a response so the other request gets a chance to win; if no response is
+    valid, the last rejected one is returned for the caller to deal with.
+    """
+    hedge_model = hedge_model or model_LLM
+    threshold = get_tracker(model_LLM).percentile(HEDGE_PERCENTILE)
+    _bump("calls")
+    started = time.monotonic()
+    attempts = {}  # future -> (label, model, cancel_event, launched_at)
+
+    def launch(label, model):
+        cancel_event = CancelEvent()
+        attempts[_executor.submit(_run_attempt, model, fn, cancel_event)] = (label, model, cancel_event,
+                                                                              time.monotonic())
+
+    launch("primary", model_LLM)
+    if threshold is not None:
+        done, _ = wait(list(attempts), timeout=threshold)
+        if not done:
+            launch("hedge", hedge_model)
+            _bump("hedged")
+
+    pending = set(attempts)
+    last_error = None
+    rejected = []
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            label, _, _, launched_at = attempts[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            if is_valid is not None and not is_valid(result):
+                rejected.append(result)
+                continue
+            now = time.monotonic()
+            for other in pending:
+                other_label, other_model, other_cancel, _ = attempts[other]
+                other_cancel.set()
+                # A losing hedge started late, so its elapsed time says nothing about the tail
+                if other_label == "primary":
+                    record_latency(other_model, now - started)
+                    _bump("censored")
+            if len(attempts) > 1:
+                if label == "hedge":
+                    _bump("hedge_wins")
+                    # How long this call waited before hedging (the p95 delay), not latency saved
+                    _bump("hedge_delay_seconds", launched_at - started)
+                else:
+                    _bump("primary_wins")
+            return result
+    # The model answered, just not usefully: that is the caller's parse error, not an outage
+    if rejected:
+        return rejected[-1]
+    raise last_error
+
+
+def hedging_stats():
+    """Hedge rate, winners, estimated seconds saved and current p95 per model."""
+    with _lock:
+        stats = dict(_stats)
+        trackers = dict(_trackers)
+    stats["hedge_rate"] = round(stats["hedged"] / stats["calls"], 4) if stats["calls"] else 0.0
+    stats["hedge_delay_seconds"] = round(stats["hedge_delay_seconds"], 3)
+    stats["enabled"] = HEDGE_ENABLED
+    stats["models"] = {
+        model: {"samples": tracker.count(), "p95_seconds": tracker.percentile(HEDGE_PERCENTILE)}
+        for model, tracker in trackers.items()
+    }
+    return stats
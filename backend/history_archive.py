@@ -0,0 +1,108 @@
+"""
+Compressed archive for cold (sealed) history segments.
+
+A sealed segment seg-<n>.jsonl is rewritten as seg-<n>.jsonl.gz: a sequence of gzip
+members, each holding ARCHIVE_BLOCK_MESSAGES lines. The concatenation is still a valid
+gzip file (`zcat` works), but every member can also be decompressed on its own. The
+block index ([first seq, byte offset, compressed length] per block) goes into the
+segment's record in segments.json, so reading a page of old history decompresses only
+the blocks that overlap it.
+
+The segmented store archives every sealed segment except the newest HISTORY_HOT_SEGMENTS
+on a background thread after it seals one. By hand:
+    python history_archive.py archive [--dir data/history_segments]
+Benchmark (compression ratio, decode latency per block size): scripts/bench_history_archive.py
+"""
+import bisect
+import gzip
+import os
+import threading
+import zlib
+
+from history_store import HistoryStore
+
+# Messages per independently decompressible gzip member
+ARCHIVE_BLOCK_MESSAGES = int(os.environ.get("HISTORY_ARCHIVE_BLOCK_MESSAGES", "64"))
+ARCHIVE_COMPRESS_LEVEL = 9
+ARCHIVE_SUFFIX = ".gz"
+
+
+def _segment_lines(path):
+    """Non-empty lines of a plain segment, in order."""
+    with open(path, "rb") as f:
+        return [line if line.endswith(b"\n") else line + b"\n" for line in f if line.strip()]
+
+
+def compress_lines(lines, first_seq, out, block_messages=ARCHIVE_BLOCK_MESSAGES):
+    """Write `lines` to the binary file `out` as gzip members; return the block index."""
+    blocks = []
+    offset = out.tell()
+    for i in range(0, len(lines), block_messages):
+        member = gzip.compress(b"".join(lines[i:i + block_messages]), compresslevel=ARCHIVE_COMPRESS_LEVEL, mtime=0)
+        out.write(member)
+        blocks.append([first_seq + i, offset, len(member)])
+        offset += len(member)
+    return blocks
+
+
+def archive_segment(directory, seg, block_messages=ARCHIVE_BLOCK_MESSAGES):
+    """
+    Compress one sealed segment record (from segments.json) and add its "archive" entry.
+    Returns the plain file to delete once the updated sidecar is on disk.
+    """
+    plain = directory / seg["file"]
+    lines = _segment_lines(plain)
+    archive_name = seg["file"] + ARCHIVE_SUFFIX
+    # Per-writer temp name: two processes may archive the same segment; the output is identical
+    tmp = directory / f"{archive_name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as out:
+        blocks = compress_lines(lines, seg["first_seq"], out, block_messages)
+        size = out.tell()
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, directory / archive_name)
+    seg["archive"] = {"file": archive_name, "bytes": size, "block_messages": block_messages, "blocks": blocks}
+    return plain
+
+
+def decompress_block(f, offset, length):
+    f.seek(offset)
+    # 16 + MAX_WBITS: expect a gzip header; one member only
+    return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(f.read(length))
+
+
+def read_archived(directory, seg, first, last):
+    """Entries first..last (inclusive) of an archived segment, decompressing only the blocks needed."""
+    archive = seg["archive"]
+    blocks = archive["blocks"]
+    i = max(0, bisect.bisect_right([b[0] for b in blocks], first) - 1)
+    out = []
+    with open(directory / archive["file"], "rb") as f:
+        while i < len(blocks) and blocks[i][0] <= last:
+            seq, offset, length = blocks[i]
+            for raw in decompress_block(f, offset, length).split(b"\n"):
+                if not raw.strip():
+                    continue
+                if first <= seq <= last:
+                    entry = HistoryStore._parse(raw.decode("utf-8", errors="replace"), seq)
+                    if entry is not None:
+                        out.append(entry)
+                seq += 1
+            i += 1
+    return out
+
+
+def main():
+    import argparse
+    from history_segments import HISTORY_SEGMENTS_DIR, SegmentedHistoryStore
+    parser = argparse.ArgumentParser(description="Compress sealed history segments")
+    parser.add_argument("action", choices=["archive"])
+    parser.add_argument("--dir", default=str(HISTORY_SEGMENTS_DIR), help="Segment directory")
+    parser.add_argument("--keep-hot", type=int, default=0, help="Newest sealed segments to leave uncompressed")
+    args = parser.parse_args()
+    store = SegmentedHistoryStore(args.dir)
+    print(f"Archived {store.archive_cold(keep_hot=args.keep_hot)} segments in {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Segmented, rotating history log (HISTORY_BACKEND=segmented).
+
+Instead of one ever-growing JSONL file, the history lives in a directory of segments
+(data/history_segments/seg-<first seq>.jsonl). New messages go only to the active
+segment; once it reaches HISTORY_SEGMENT_BYTES it is sealed and a new one is started.
+A sidecar (segments.json) lists every sealed segment with its first/last seq, size and a
+sparse index: the byte offset of every SPARSE_INDEX_EVERY-th message. Any seq is found
+by a binary search over the segments, a bisect in that segment's sparse index and one
+seek, reading at most SPARSE_INDEX_EVERY lines. The active segment is a HistoryStore,
+so tailing it costs only the appended bytes. Sealed segments are never written again;
+all but the newest HISTORY_HOT_SEGMENTS of them are compressed into block archives
+(history_archive.py) on a background thread, so appends never wait for compression;
+only the sidecar swap takes the directory lock.
+
+Same API as history_store.HistoryStore. Move an existing log in with:
+    python history_segments.py import [--jsonl data/conversational_history.txt]
+"""
+import bisect
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import history_archive
+from history_store import HISTORY_FILE, REPO_ROOT, HistoryStore, fcntl
+
+HISTORY_SEGMENTS_DIR = Path(os.environ.get("HISTORY_SEGMENTS_DIR", str(REPO_ROOT / "data" / "history_segments")))
+HISTORY_SEGMENT_BYTES = int(os.environ.get("HISTORY_SEGMENT_BYTES", str(4 << 20)))
+SPARSE_INDEX_EVERY = 32
+# Sealed segments kept as plain JSONL; older ones are compressed (-1 disables archiving)
+HISTORY_HOT_SEGMENTS = int(os.environ.get("HISTORY_HOT_SEGMENTS", "2"))
+SIDECAR_NAME = "segments.json"
+LOCK_NAME = ".lock"
+
+
+def segment_name(first_seq):
+    return f"seg-{first_seq:012d}.jsonl"
+
+
+class SegmentedHistoryStore:
+    """History split across sealed segments plus one active segment. Safe to share across threads."""
+
+    def __init__(self, directory=HISTORY_SEGMENTS_DIR, segment_bytes=HISTORY_SEGMENT_BYTES):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self._lock = threading.RLock()
+        self._sidecar = self.directory / SIDECAR_NAME
+        self._sidecar_mtime = None
+        self.sealed = []  # sidecar records of sealed segments, oldest first
+        self._first_seqs = []
+        self._active = None
+        self._active_first = 1
+        self._archiver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-archive")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load_sidecar()
+
+    # --- sidecar -------------------------------------------------------------------
+
+    def _load_sidecar(self):
+        """(Re)read segments.json if another process (or this one) changed it. Caller holds the lock."""
+        try:
+            mtime = os.stat(self._sidecar).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._sidecar_mtime and self._active is not None:
+            return
+        meta = {"sealed": [], "active": {"file": segment_name(1), "first_seq": 1}}
+        if mtime is not None:
+            with open(self._sidecar, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        self.sealed = meta["sealed"]
+        self._first_seqs = [seg["first_seq"] for seg in self.sealed]
+        active_path = self.directory / meta["active"]["file"]
+        if self._active is None or self._active.path != active_path:
+            self._active = HistoryStore(active_path)
+        self._active_first = meta["active"]["first_seq"]
+        self._sidecar_mtime = mtime
+
+    def _write_sidecar(self):
+        meta = {
+            "sealed": self.sealed,
+            "active": {"file": self._active.path.name, "first_seq": self._active_first},
+        }
+        tmp = self._sidecar.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._sidecar)
+        self._sidecar_mtime = os.stat(self._sidecar).st_mtime_ns
+
+    def _seal_active(self):
+        """Freeze the active segment into the sidecar and start a new one. Caller holds both locks."""
+        count = self._active.count()
+        if count == 0:
+            return
+        base = self._active_first - 1
+        self.sealed.append({
+            "file": self._active.path.name,
+            "first_seq": self._active_first,
+            "last_seq": base + count,
+            "bytes": os.stat(self._active.path).st_size,
+            "index": [[base + seq, offset] for seq, offset in self._active.sparse_offsets(SPARSE_INDEX_EVERY)],
+        })
+        self._first_seqs.append(self._active_first)
+        self._active_first = base + count + 1
+        self._active = HistoryStore(self.directory / segment_name(self._active_first))
+        self._write_sidecar()
+
+    # --- reads ---------------------------------------------------------------------
+
+    def _read_sealed(self, seg, first, last):
+        """Entries first..last (inclusive) of a sealed segment: one seek, then a forward read."""
+        points = seg["index"]
+        i = bisect.bisect_right([p[0] for p in points], first) - 1
+        seq, offset = points[max(0, i)]
+        out = []
+        with open(self.directory / seg["file"], "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.strip():
+                    continue
+                if seq > last:
+                    break
+                if seq >= first:
+                    entry = HistoryStore._parse(raw.decode("utf-8", errors="replace"), seq)
+                    if entry is not None:
+                        out.append(entry)
+                seq += 1
+        return out
+
+    def _read_active(self, first, last):
+        base = self._active_first - 1
+        entries = self._active.since(first - base - 1, last - first + 1)
+        for entry in entries:
+            entry["seq"] += base
+        return entries
+
+    def _range(self, first, last):
+        """Entries with first <= seq <= last, oldest first. Caller holds the lock."""
+        first = max(1, first)
+        out = []
+        if first > last:
+            return out
+        i = max(0, bisect.bisect_right(self._first_seqs, first) - 1)
+        while i < len(self.sealed) and self.sealed[i]["first_seq"] <= last:
+            seg = self.sealed[i]
+            if seg["last_seq"] >= first:
+                out.extend(self._read_segment(seg, max(first, seg["first_seq"]), min(last, seg["last_seq"])))
+            i += 1
+        if last >= self._active_first:
+            out.extend(self._read_active(max(first, self._active_first), last))
+        return out
+
+    def _read_segment(self, seg, first, last):
+        try:
+            if "archive" in seg:
+                return history_archive.read_archived(self.directory, seg, first, last)
+            return self._read_sealed(seg, first, last)
+        except FileNotFoundError:
+            # Another process archived this segment since our sidecar was loaded
+            self._sidecar_mtime = None
+            self._load_sidecar()
+            seg = self.sealed[bisect.bisect_right(self._first_seqs, first) - 1]
+            return history_archive.read_archived(self.directory, seg, first, last)
+
+    def _last_seq(self):
+        return self._active_first - 1 + self._active.count()
+
+    def count(self):
+        with self._lock:
+            self._load_sidecar()
+            return self._last_seq()
+
+    def last_seq(self):
+        return self.count()
+
+    def version(self):
+        """Token that changes whenever a message is added (for ETags)."""
+        with self._lock:
+            self._load_sidecar()
+            return f"seg-{self._active_first}-{self._active.version()}"
+
+    def tail(self, n):
+        if n <= 0:
+            return []
+        with self._lock:
+            self._load_sidecar()
+            last = self._last_seq()
+            return self._range(last - n + 1, last)
+
+    def last(self):
+        entries = self.tail(1)
+        return entries[-1] if entries else None
+
+    def since(self, seq, limit=None):
+        with self._lock:
+            self._load_sidecar()
+            last = self._last_seq()
+            if limit is not None:
+                last = min(last, seq + limit)
+            return self._range(seq + 1, last)
+
+    def before(self, seq, limit):
+        if limit <= 0:
+            return []
+        with self._lock:
+            self._load_sidecar()
+            last = min(self._last_seq(), seq - 1)
+            return self._range(last - limit + 1, last)
+
+    def all(self):
+        return self.since(0)
+
+    def follow(self, cursor=None, limit=None):
+        """Entries after `cursor` and the next cursor; seqs never restart, so no generation check."""
+        with self._lock:
+            self._load_sidecar()
+            total = self._last_seq()
+            if cursor is None:
+                return [], (0, total)
+            seq = cursor[1] if cursor[1] <= total else 0
+            last = total if limit is None else min(total, seq + limit)
+            return self._range(seq + 1, last), (0, max(seq, last))
+
+    # --- writes --------------------------------------------------------------------
+
+    def _locked(self):
+        """Directory-wide lock so appends and sealing from several processes do not interleave."""
+        return _DirLock(self.directory / LOCK_NAME)
+
+    def _append_locked(self, role, content, timestamp=None):
+        self._load_sidecar()
+        entry = self._active.append(role, content, seq_base=self._active_first - 1, timestamp=timestamp)
+        if os.stat(self._active.path).st_size >= self.segment_bytes:
+            self._seal_active()
+            if HISTORY_HOT_SEGMENTS >= 0:
+                # Compression takes a fraction of a second per segment; keep it off the append path
+                self._archiver.submit(self._archive_in_background, HISTORY_HOT_SEGMENTS)
+        return entry
+
+    def _archive_in_background(self, keep_hot):
+        try:
+            self.archive_cold(keep_hot)
+        except Exception as e:
+            print(f"Warning: could not archive history segments in {self.directory}: {e!r}")
+
+    def archive_cold(self, keep_hot=HISTORY_HOT_SEGMENTS):
+        """
+        Compress every sealed segment except the newest `keep_hot`. Returns how many were archived.
+        Sealed segments never change, so they are compressed without the locks; only the sidecar
+        update is done under them.
+        """
+        with self._lock, self._locked():
+            self._load_sidecar()
+            cold = [dict(seg) for seg in self.sealed[:max(0, len(self.sealed) - keep_hot)] if "archive" not in seg]
+        archived = []
+        for seg in cold:
+            try:
+                archived.append((seg, history_archive.archive_segment(self.directory, seg)))
+            except FileNotFoundError:
+                pass  # another process archived it meanwhile
+        if not archived:
+            return 0
+        plain_files = []
+        with self._lock, self._locked():
+            self._load_sidecar()
+            current = {seg["first_seq"]: seg for seg in self.sealed}
+            for seg, plain in archived:
+                record = current.get(seg["first_seq"])
+                if record is not None and "archive" not in record:
+                    record["archive"] = seg["archive"]
+                    plain_files.append(plain)
+            if plain_files:
+                self._write_sidecar()
+        # Only now that the sidecar points at the archives can the plain segments go
+        for path in plain_files:
+            path.unlink(missing_ok=True)
+        return len(plain_files)
+
+    def append(self, role, content):
+        """Append to the active segment (sealing it once it is full) and return the stored entry."""
+        with self._lock, self._locked():
+            return self._append_locked(role, content)
+
+    def import_jsonl(self, jsonl_path=HISTORY_FILE):
+        """Append every valid line of a JSONL history file, keeping its timestamps. Returns the count."""
+        count = 0
+        with self._lock, self._locked():
+            for entry in HistoryStore(jsonl_path).all():
+                self._append_locked(entry.get("role", ""), entry.get("content", ""), entry.get("timestamp"))
+                count += 1
+        return count
+
+
+class _DirLock:
+    def __init__(self, path):
+        self.path = path
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._f, fcntl.LOCK_UN)
+        self._f.close()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Split a JSONL history file into log segments")
+    parser.add_argument("action", choices=["import"])
+    parser.add_argument("--jsonl", default=str(HISTORY_FILE), help="JSONL history file to import")
+    parser.add_argument("--dir", default=str(HISTORY_SEGMENTS_DIR), help="Segment directory")
+    args = parser.parse_args()
+    store = SegmentedHistoryStore(args.dir)
+    print(f"Imported {store.import_jsonl(args.jsonl)} messages into {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
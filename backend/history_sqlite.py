@@ -0,0 +1,173 @@
+"""
+SQLite (WAL) backend for the conversation history, selected with HISTORY_BACKEND=sqlite.
+
+Same API as history_store.HistoryStore (append, tail, since, before, count, last, all), so every
+call site works unchanged. Messages get a monotonically increasing INTEGER PRIMARY KEY
+id (used as "seq") and a write-time timestamp, with an index on timestamp. In WAL mode
+the simulation (one writer) and the server's /api/history and SSE readers do not block
+each other, and since(seq) / tail(n) are indexed range queries instead of file scans.
+
+Import/export to the JSONL format:
+    python history_sqlite.py import [--jsonl data/conversational_history.txt] [--db data/conversational_history.db]
+    python history_sqlite.py export --jsonl out.txt [--db data/conversational_history.db]
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+HISTORY_DB = REPO_ROOT / "data" / "conversational_history.db"
+HISTORY_FILE = REPO_ROOT / "data" / "conversational_history.txt"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp);
+"""
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class SqliteHistoryStore:
+    """History in a WAL-mode SQLite database. One connection per thread."""
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: durable across app crashes, one fsync per checkpoint instead of per commit
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _entry(row):
+        return {"role": row["role"], "content": row["content"], "timestamp": row["timestamp"], "seq": row["id"]}
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def last_seq(self):
+        """Id of the newest message (0 if empty)."""
+        return self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+
+    def version(self):
+        """Token that changes whenever a message is added (for ETags); ids are append-only."""
+        return f"db-{self.last_seq()}"
+
+    def tail(self, n):
+        if n <= 0:
+            return []
+        rows = self._conn().execute(
+            "SELECT id, role, content, timestamp FROM messages ORDER BY id DESC LIMIT ?", (n,)
+        ).fetchall()
+        return [self._entry(row) for row in reversed(rows)]
+
+    def last(self):
+        entries = self.tail(1)
+        return entries[-1] if entries else None
+
+    def since(self, seq, limit=None):
+        rows = self._conn().execute(
+            "SELECT id, role, content, timestamp FROM messages WHERE id > ? ORDER BY id LIMIT ?",
+            (seq, -1 if limit is None else limit),
+        ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def before(self, seq, limit):
+        if limit <= 0:
+            return []
+        rows = self._conn().execute(
+            "SELECT id, role, content, timestamp FROM messages WHERE id < ? ORDER BY id DESC LIMIT ?", (seq, limit)
+        ).fetchall()
+        return [self._entry(row) for row in reversed(rows)]
+
+    def all(self):
+        return self.since(0)
+
+    def follow(self, cursor=None, limit=None):
+        """Entries after `cursor` and the next cursor (ids never restart, so no generation check)."""
+        if cursor is None:
+            return [], (0, self.last_seq())
+        entries = self.since(cursor[1], limit)
+        return entries, (0, entries[-1]["seq"] if entries else cursor[1])
+
+    def append(self, role, content, timestamp=None):
+        """Insert one message and return it as stored (with its id as seq)."""
+        timestamp = timestamp or _utc_now()
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(
+                "INSERT INTO messages (role, content, timestamp) VALUES (?, ?, ?)", (role, content, timestamp)
+            )
+        return {"role": role, "content": content, "timestamp": timestamp, "seq": cur.lastrowid}
+
+    def import_jsonl(self, jsonl_path=HISTORY_FILE):
+        """Append every valid line of a JSONL history file. Returns the number imported."""
+        from history_store import HistoryStore
+
+        rows = [
+            (entry.get("role", ""), entry.get("content", ""), entry.get("timestamp") or _utc_now())
+            for entry in HistoryStore(jsonl_path).all()
+        ]
+        conn = self._conn()
+        with conn:
+            conn.executemany("INSERT INTO messages (role, content, timestamp) VALUES (?, ?, ?)", rows)
+        return len(rows)
+
+    def export_jsonl(self, jsonl_path):
+        """Write all messages as JSONL ({"role", "content", "timestamp"} per line). Returns the count."""
+        count = 0
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            last_seq = 0
+            while True:
+                batch = self.since(last_seq, limit=1000)
+                if not batch:
+                    break
+                for entry in batch:
+                    f.write(json.dumps({
+                        "role": entry["role"], "content": entry["content"], "timestamp": entry["timestamp"]
+                    }) + "\n")
+                    count += 1
+                last_seq = batch[-1]["seq"]
+        return count
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Import/export conversation history between JSONL and SQLite")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("--db", default=str(HISTORY_DB), help="SQLite database path")
+    parser.add_argument("--jsonl", help="JSONL history file (import default: data/conversational_history.txt; "
+                                         "required for export so the live log is never overwritten by accident)")
+    args = parser.parse_args()
+    store = SqliteHistoryStore(args.db)
+    if args.action == "import":
+        jsonl = args.jsonl or str(HISTORY_FILE)
+        print(f"Imported {store.import_jsonl(jsonl)} messages into {args.db}")
+    else:
+        if not args.jsonl:
+            parser.error("export needs --jsonl <path>")
+        print(f"Exported {store.export_jsonl(args.jsonl)} messages to {args.jsonl}")
+
+
+if __name__ == "__main__":
+    main()
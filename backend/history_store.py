@@ -0,0 +1,298 @@
+"""
+HistoryStore: the one place that reads and writes the conversation history.
+
+The history is a JSONL file (data/conversational_history.txt), one
+{"seq", "role", "content", "timestamp"} object per line; seq and the UTC timestamp are
+stamped once by append() and never change (older lines may only have role/content).
+utils, simulation_stream, server, run.py and the agent scripts used to parse it by
+hand; they now go through this API:
+
+    store = get_store()
+    store.append(role, content)   -> entry
+    store.tail(n)                 -> last n entries, oldest first
+    store.since(seq, limit=None)  -> entries with sequence id > seq
+    store.before(seq, limit)      -> up to `limit` entries with sequence id < seq
+    store.count()                 -> number of entries
+    store.last()                  -> last entry or None
+    store.follow(cursor)          -> (new entries, cursor) for tailing readers
+
+Every entry dict carries a "seq" (1-based position among the non-empty lines; a line
+that is not valid JSON keeps its seq but is skipped in results). The store keeps an
+in-process index of each line's byte offset and a small cache of the newest parsed
+entries. Before each query it indexes only the bytes appended since the last query
+(by any process), so tail/since cost O(k) in the entries returned, not the file size.
+A file that shrinks or is replaced (new inode) is re-indexed from scratch.
+
+HISTORY_BACKEND=sqlite switches get_store() to history_sqlite.SqliteHistoryStore
+(WAL-mode database at HISTORY_DB) and HISTORY_BACKEND=segmented to
+history_segments.SegmentedHistoryStore (rotating segments in HISTORY_SEGMENTS_DIR);
+both have the same API.
+"""
+import json
+import os
+import threading
+from array import array
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends from several processes are not serialised
+    fcntl = None
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+HISTORY_FILE = REPO_ROOT / "data" / "conversational_history.txt"
+HISTORY_DB = Path(os.environ.get("HISTORY_DB", str(REPO_ROOT / "data" / "conversational_history.db")))
+
+BACKEND_JSONL = "jsonl"
+BACKEND_SQLITE = "sqlite"
+BACKEND_SEGMENTED = "segmented"
+HISTORY_BACKEND = os.environ.get("HISTORY_BACKEND", BACKEND_JSONL)
+
+# Newest parsed entries kept in memory; tail(n) for n <= this never touches the disk
+RECENT_CACHE_SIZE = 64
+# Appended bytes are indexed in chunks of this size, so a first scan of a big file stays bounded in memory
+READ_CHUNK_SIZE = 1 << 20
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class HistoryStore:
+    """Indexed access to a JSONL history file. Safe to share across threads."""
+
+    def __init__(self, path=HISTORY_FILE):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self.generation = 0  # bumped whenever the index is rebuilt (truncation / rotation)
+        self._reset()
+
+    def _reset(self):
+        self.generation += 1
+        self._offsets = array("q")  # byte offset of entry seq=i+1
+        self._indexed_size = 0  # bytes covered by the index (always ends on a newline)
+        self._inode = None
+        self._recent = deque(maxlen=RECENT_CACHE_SIZE)  # (seq, entry) for the newest entries
+
+    @staticmethod
+    def _parse(line, seq):
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(entry, dict):
+            return None
+        entry = dict(entry)
+        entry["seq"] = seq
+        return entry
+
+    def _refresh(self):
+        """Index any complete lines appended since the last call (caller holds the lock)."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self._offsets:
+                self._reset()
+            return
+        if self._inode is not None and (st.st_ino != self._inode or st.st_size < self._indexed_size):
+            self._reset()
+        self._inode = st.st_ino
+        if st.st_size == self._indexed_size:
+            return
+        first_new = len(self._offsets) + 1
+        with open(self.path, "rb") as f:
+            f.seek(self._indexed_size)
+            pos = self._indexed_size
+            carry = b""
+            while pos < st.st_size:
+                chunk = f.read(min(READ_CHUNK_SIZE, st.st_size - pos))
+                if not chunk:
+                    break
+                buf_start = pos - len(carry)
+                buf = carry + chunk
+                pos += len(chunk)
+                end = buf.rfind(b"\n")
+                if end == -1:
+                    carry = buf  # partial line; wait for the rest
+                    continue
+                offset = buf_start
+                for raw in buf[:end + 1].split(b"\n")[:-1]:
+                    if raw.strip():
+                        self._offsets.append(offset)
+                    offset += len(raw) + 1
+                self._indexed_size = buf_start + end + 1
+                carry = buf[end + 1:]
+        last_new = len(self._offsets)
+        if last_new < first_new:
+            return
+        # Only the newest entries are parsed up front, to keep the recent cache warm
+        first_cached = max(first_new, last_new - RECENT_CACHE_SIZE + 1)
+        if first_cached > first_new:
+            self._recent.clear()
+        for entry in self._read_disk(first_cached, last_new):
+            self._recent.append((entry["seq"], entry))
+
+    def _read_disk(self, first_seq, last_seq):
+        """Parse entries first_seq..last_seq (inclusive) with a single contiguous read."""
+        start = self._offsets[first_seq - 1]
+        stop = self._offsets[last_seq] if last_seq < len(self._offsets) else self._indexed_size
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            data = f.read(stop - start)
+        out = []
+        seq = first_seq
+        for raw in data.split(b"\n"):
+            if not raw.strip():
+                continue
+            entry = self._parse(raw.decode("utf-8", errors="replace"), seq)
+            if entry is not None:
+                out.append(entry)
+            seq += 1
+        return out
+
+    def _read_from(self, first_seq, last_seq):
+        """Entries first_seq..last_seq (inclusive), from the recent cache when it covers them."""
+        if first_seq > last_seq:
+            return []
+        if self._recent and self._recent[0][0] <= first_seq:
+            return [dict(entry) for seq, entry in self._recent if first_seq <= seq <= last_seq]
+        return self._read_disk(first_seq, last_seq)
+
+    def count(self):
+        with self._lock:
+            self._refresh()
+            return len(self._offsets)
+
+    def last_seq(self):
+        """Sequence id of the newest entry (0 if empty)."""
+        return self.count()
+
+    def version(self):
+        """Cheap token that changes whenever the history does (for ETags): generation, last seq, bytes."""
+        with self._lock:
+            self._refresh()
+            return f"{self.generation}-{len(self._offsets)}-{self._indexed_size}"
+
+    def tail(self, n):
+        """Last `n` entries, oldest first."""
+        if n <= 0:
+            return []
+        with self._lock:
+            self._refresh()
+            total = len(self._offsets)
+            return self._read_from(max(1, total - n + 1), total)
+
+    def last(self):
+        entries = self.tail(1)
+        return entries[-1] if entries else None
+
+    def since(self, seq, limit=None):
+        """Entries with sequence id > seq, oldest first (at most `limit` of them)."""
+        with self._lock:
+            self._refresh()
+            total = len(self._offsets)
+            first = max(1, seq + 1)
+            last = total if limit is None else min(total, first + limit - 1)
+            return self._read_from(first, last)
+
+    def before(self, seq, limit):
+        """The newest `limit` entries with sequence id < seq, oldest first."""
+        if limit <= 0:
+            return []
+        with self._lock:
+            self._refresh()
+            last = min(len(self._offsets), seq - 1)
+            return self._read_from(max(1, last - limit + 1), last)
+
+    def all(self):
+        return self.since(0)
+
+    def follow(self, cursor=None, limit=None):
+        """
+        Entries appended after `cursor`, and the cursor to pass next time.
+        cursor=None starts at the current end. The cursor records the index generation,
+        so after a truncation or rotation the reader restarts at the top of the new file
+        instead of waiting for the seq to catch up with its old position.
+        """
+        with self._lock:
+            self._refresh()
+            if cursor is None:
+                return [], (self.generation, len(self._offsets))
+            generation, seq = cursor
+            if generation != self.generation:
+                seq = 0
+            total = len(self._offsets)
+            last = total if limit is None else min(total, seq + limit)
+            # The cursor moves past invalid lines too, so they are not re-read every tick
+            return self._read_from(seq + 1, last), (self.generation, max(seq, last))
+
+    def sparse_offsets(self, every):
+        """[(seq, byte offset)] for seq 1, 1+every, 1+2*every, ... (used to seal log segments)."""
+        with self._lock:
+            self._refresh()
+            return [(i + 1, self._offsets[i]) for i in range(0, len(self._offsets), every)]
+
+    def append(self, role, content, seq_base=0, timestamp=None):
+        """
+        Append one message stamped with its seq and a UTC timestamp; return it as stored.
+        seq_base shifts the stamped seq, for a file that is one segment of a longer log;
+        timestamp keeps an existing write time (imports).
+        """
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                # The file lock keeps seq == line position when run.py and the server both write
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    self._refresh()
+                    entry = {
+                        "seq": seq_base + len(self._offsets) + 1,
+                        "role": role,
+                        "content": content,
+                        "timestamp": timestamp or _utc_now(),
+                    }
+                    f.write(json.dumps(entry) + "\n")
+                    f.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            self._refresh()
+            return entry
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=None, backend=None):
+    """
+    Process-wide store for the configured backend, so every caller shares one index.
+    `path` overrides the JSONL file, database file or segment directory of the backend.
+    """
+    backend = backend or HISTORY_BACKEND
+    if backend == BACKEND_SQLITE:
+        path = Path(path or HISTORY_DB)
+    elif backend == BACKEND_SEGMENTED:
+        from history_segments import HISTORY_SEGMENTS_DIR
+        path = Path(path or HISTORY_SEGMENTS_DIR)
+    elif backend == BACKEND_JSONL:
+        path = Path(path or HISTORY_FILE)
+    else:
+        raise ValueError(f"Unknown HISTORY_BACKEND: {backend}")
+    key = (backend, str(path.resolve()))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if backend == BACKEND_SQLITE:
+                from history_sqlite import SqliteHistoryStore
+                store = SqliteHistoryStore(path)
+            elif backend == BACKEND_SEGMENTED:
+                from history_segments import SegmentedHistoryStore
+                store = SegmentedHistoryStore(path)
+            else:
+                store = HistoryStore(path)
+            _stores[key] = store
+        return store
@@ -0,0 +1,244 @@
+"""
+Process-wide registry of LLM provider clients (Anthropic, Groq).
+
+utils.agent_sim used to build a new SDK client on every call, which threw away the
+HTTP connection pool and paid a fresh TCP+TLS handshake per bid/reply. Clients here
+are created once per (provider, api_key), share one keep-alive httpx pool, and are
+safe to use from several threads. Connection stats count new handshakes vs requests
+that went out on an already-open connection.
+
+Async clients (for agent_sim_async) get their own pool per event loop, because an
+httpx.AsyncClient's connections belong to the loop that opened them.
+
+The pools are built with each SDK's own client class (DefaultHttpxClient and friends):
+newer anthropic releases run on httpx2 and reject a plain httpx.Client.
+"""
+import asyncio
+import threading
+import weakref
+
+import anthropic
+import groq
+import httpx
+from groq import AsyncGroq, Groq
+
+PROVIDER_ANTHROPIC = "anthropic"
+PROVIDER_GROQ = "groq"
+
+PROVIDER_BASE_URLS = {
+    PROVIDER_ANTHROPIC: "https://api.anthropic.com",
+    PROVIDER_GROQ: "https://api.groq.com",
+}
+
+# Keep-alive pool per provider. Bids fan out to one call per persona, so a handful
+# of connections is enough; idle ones are kept for the gap between rounds.
+POOL_MAX_CONNECTIONS = 20
+POOL_MAX_KEEPALIVE = 10
+POOL_KEEPALIVE_EXPIRY = 120.0
+
+_lock = threading.RLock()
+_clients = {}
+_http_clients = {}
+_retry_clients = {}  # (provider, api_key, max_retries) -> copy of the shared client, same pool
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> {(provider, api_key): client}
+_stats = {}
+
+
+def provider_for_model(model_LLM):
+    """Map a model name to its provider, using the same prefixes as agent_sim."""
+    prefix = model_LLM.split("-")[0]
+    if prefix == "claude":
+        return PROVIDER_ANTHROPIC
+    if prefix in ("llama", "meta"):
+        return PROVIDER_GROQ
+    raise ValueError(f"Unknown model provider for: {model_LLM}")
+
+
+def _new_stats():
+    return {"requests": 0, "handshakes": 0, "tls_handshakes": 0}
+
+
+def _stats_for(provider):
+    with _lock:
+        return _stats.setdefault(provider, _new_stats())
+
+
+def _make_trace(provider):
+    """httpcore trace hook: a connect_tcp event means a new connection was opened."""
+    stats = _stats_for(provider)
+
+    def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            with _lock:
+                stats["handshakes"] += 1
+        elif event_name == "connection.start_tls.complete":
+            with _lock:
+                stats["tls_handshakes"] += 1
+        elif event_name.endswith("send_request_headers.started"):
+            with _lock:
+                stats["requests"] += 1
+
+    return trace
+
+
+def _pool_limits():
+    return httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def _sdk_http_client_class(provider, is_async=False):
+    """The HTTP client class the provider's SDK accepts; plain httpx for SDKs too old to export one."""
+    sdk = anthropic if provider == PROVIDER_ANTHROPIC else groq
+    if is_async:
+        return getattr(sdk, "DefaultAsyncHttpxClient", httpx.AsyncClient)
+    return getattr(sdk, "DefaultHttpxClient", httpx.Client)
+
+
+def _make_http_client(provider):
+    trace = _make_trace(provider)
+
+    def attach_trace(request):
+        request.extensions["trace"] = trace
+
+    client_class = _sdk_http_client_class(provider)
+    return client_class(limits=_pool_limits(), event_hooks={"request": [attach_trace]})
+
+
+def _make_async_http_client(provider):
+    sync_trace = _make_trace(provider)
+
+    # httpcore awaits the trace callback (and httpx the hooks) on async transports
+    async def trace(event_name, info):
+        sync_trace(event_name, info)
+
+    async def attach_trace(request):
+        request.extensions["trace"] = trace
+
+    client_class = _sdk_http_client_class(provider, is_async=True)
+    return client_class(limits=_pool_limits(), event_hooks={"request": [attach_trace]})
+
+
+def get_client(provider, api_key, max_retries=None):
+    """
+    Return the shared SDK client for (provider, api_key), creating it on first use.
+    max_retries overrides the SDK's retry count (default 2) on a copy that shares the pool.
+    """
+    if max_retries is not None:
+        key = (provider, api_key, max_retries)
+        client = _retry_clients.get(key)
+        if client is None:
+            base = get_client(provider, api_key)
+            with _lock:
+                client = _retry_clients.setdefault(key, base.with_options(max_retries=max_retries))
+        return client
+    key = (provider, api_key)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is not None:
+            return client
+        http_client = _make_http_client(provider)
+        if provider == PROVIDER_ANTHROPIC:
+            client = anthropic.Anthropic(api_key=api_key, http_client=http_client)
+        elif provider == PROVIDER_GROQ:
+            client = Groq(api_key=api_key, http_client=http_client)
+        else:
+            raise ValueError(f"Unknown provider: {provider}")
+        _clients[key] = client
+        _http_clients[key] = http_client
+    return client
+
+
+def get_async_client(provider, api_key, max_retries=None):
+    """
+    Return the shared async SDK client for (provider, api_key) on the running event loop
+    (max_retries as for get_client). Must be called from inside a coroutine.
+    """
+    loop = asyncio.get_running_loop()
+    key = (provider, api_key)
+    with _lock:
+        loop_clients = _async_clients.get(loop)
+        if loop_clients is None:
+            loop_clients = {}
+            _async_clients[loop] = loop_clients
+        if max_retries is not None:
+            retry_key = key + (max_retries,)
+            client = loop_clients.get(retry_key)
+            if client is None:
+                client = get_async_client(provider, api_key).with_options(max_retries=max_retries)
+                loop_clients[retry_key] = client
+            return client
+        client = loop_clients.get(key)
+        if client is not None:
+            return client
+        http_client = _make_async_http_client(provider)
+        if provider == PROVIDER_ANTHROPIC:
+            client = anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client)
+        elif provider == PROVIDER_GROQ:
+            client = AsyncGroq(api_key=api_key, http_client=http_client)
+        else:
+            raise ValueError(f"Unknown provider: {provider}")
+        loop_clients[key] = client
+    return client
+
+
+def warm_up(api_keys):
+    """
+    Create clients for every provider with a key and open one pooled connection each,
+    so the first bid of the first round does not pay the handshake.
+    api_keys: {provider: api_key}. Errors are swallowed; warm-up is best effort.
+    """
+    for provider, api_key in api_keys.items():
+        if not api_key:
+            continue
+        try:
+            get_client(provider, api_key)
+            # Any response (even 404) leaves a keep-alive connection in the pool.
+            _http_clients[(provider, api_key)].head(PROVIDER_BASE_URLS[provider], timeout=5.0)
+        except Exception as e:
+            print(f"Warning: LLM client warm-up failed for {provider}: {e}")
+
+
+def connection_stats():
+    """Return pooled client count and per-provider {requests, handshakes, tls_handshakes, reused}."""
+    providers = {}
+    with _lock:
+        for provider, stats in _stats.items():
+            entry = dict(stats)
+            entry["reused"] = max(0, stats["requests"] - stats["handshakes"])
+            providers[provider] = entry
+        async_count = sum(len([k for k in loop_clients if len(k) == 2]) for loop_clients in _async_clients.values())
+        return {"clients": len(_clients), "async_clients": async_count, "providers": providers}
+
+
+async def aclose_loop_clients():
+    """Close the async clients that belong to the running event loop."""
+    with _lock:
+        loop_clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for key, client in loop_clients.items():
+        if len(key) != 2:
+            continue  # a max_retries copy; its pool is closed with the base client
+        try:
+            await client.close()
+        except Exception:
+            pass
+
+
+def close_all():
+    """Close every pooled sync client (used on server shutdown)."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _http_clients.clear()
+        # Copies share their base client's pool, which is closed below
+        _retry_clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
@@ -0,0 +1,133 @@
+"""
+Zero-LLM bidder: scores personas against the recent conversation with hashed TF-IDF
+vectors and cosine similarity (NumPy), for high-volume simulations (BID_MODE=local).
+
+Every config/*_persona_prompt.txt is turned into an L2-normalised TF-IDF vector once
+(and again only when the prompt registry sees it change), using the feature-hashing
+trick so there is no vocabulary to maintain. The vectors are kept as one sparse
+(row, column, weight) list of non-zero terms. Each round the recent history becomes one
+more vector, and a single pass over the non-zero terms scores all personas. Only the
+message text is scored: "Role:" prefixes would make the last speaker match its own
+persona. Raw cosine similarity is mapped onto the 0-100 scale the LLM bidders return
+(LOCAL_MIN_SCORE at no overlap, 100 at LOCAL_FULL_SCORE_SIMILARITY and above), so
+run.py's `score * credits_left` scaling is unchanged and nobody bids everything just for
+being the closest match.
+"""
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from prompt_registry import get_registry
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CONFIG_DIR = REPO_ROOT / "config"
+PERSONA_SUFFIX = "_persona_prompt.txt"
+
+# Hashed feature space. Persona vectors are stored sparsely (only their non-zero terms),
+# so memory grows with the words in the prompts, not with personas x N_FEATURES.
+N_FEATURES = 2 ** 14
+# Cosine similarity that earns a full 100; persona-vs-conversation similarities are mostly 0-0.2
+LOCAL_FULL_SCORE_SIMILARITY = 0.4
+# Score with no overlap at all, so a fresh conversation still gets bids
+LOCAL_MIN_SCORE = 10
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+# Very common words carry no signal about who should speak next
+STOP_WORDS = frozenset(
+    "a an and are as at be but by do for from have i i'm im in is it it's its me my of on or so "
+    "that the this to was we what with you your yours".split()
+)
+
+
+def tokenize(text):
+    """Lowercase word tokens with stop words removed."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS and len(t) > 1]
+
+
+def _hash_counts(tokens):
+    """Return (columns, counts) arrays for the hashed term counts of `tokens`."""
+    if not tokens:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    # crc32 is stable across processes, unlike hash()
+    cols = np.fromiter((zlib.crc32(t.encode("utf-8")) % N_FEATURES for t in tokens), dtype=np.int64,
+                       count=len(tokens))
+    uniq, counts = np.unique(cols, return_counts=True)
+    return uniq, counts.astype(np.float32)
+
+
+class LocalBidder:
+    """Hashed TF-IDF model of a set of personas."""
+
+    def __init__(self, persona_texts):
+        """persona_texts: {person_name: persona prompt text}."""
+        self.person_names = list(persona_texts)
+        self._row = {name: i for i, name in enumerate(self.person_names)}
+        rows, cols, tf = [], [], []
+        for i, name in enumerate(self.person_names):
+            term_cols, counts = _hash_counts(tokenize(persona_texts[name]))
+            rows.append(np.full(term_cols.size, i, dtype=np.int64))
+            cols.append(term_cols)
+            # Sublinear tf so one repeated word does not dominate a long persona
+            tf.append(1.0 + np.log(counts))
+        n_docs = len(self.person_names)
+        # Sparse (COO) matrix: persona row, hashed column and weight of every non-zero term
+        self.rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        self.cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        tf = np.concatenate(tf) if tf else np.zeros(0, dtype=np.float32)
+        # Columns are unique within a row, so the column counts are the document frequencies
+        df = np.bincount(self.cols, minlength=N_FEATURES)
+        self.idf = (np.log((1.0 + max(1, n_docs)) / (1.0 + df)) + 1.0).astype(np.float32)
+        weights = tf * self.idf[self.cols]
+        norms = np.sqrt(np.bincount(self.rows, weights=weights * weights, minlength=n_docs))
+        norms[norms == 0] = 1.0
+        self.data = (weights / norms[self.rows]).astype(np.float32)
+
+    @classmethod
+    def from_config_dir(cls, config_dir=CONFIG_DIR):
+        persona_texts = {}
+        for path in sorted(Path(config_dir).glob(f"*{PERSONA_SUFFIX}")):
+            persona_texts[path.name[:-len(PERSONA_SUFFIX)]] = path.read_text(encoding="utf-8")
+        return cls(persona_texts)
+
+    def similarities(self, text, person_names=None):
+        """Cosine similarity of `text` to each persona, as {person_name: float}."""
+        names = self.person_names if person_names is None else [n for n in person_names if n in self._row]
+        if not names:
+            return {}
+        cols, counts = _hash_counts(tokenize(text))
+        if cols.size == 0:
+            return {name: 0.0 for name in names}
+        query = (1.0 + np.log(counts)) * self.idf[cols]
+        query /= np.linalg.norm(query)
+        dense_query = np.zeros(N_FEATURES, dtype=np.float32)
+        dense_query[cols] = query
+        # Sparse matrix-vector product: each persona's non-zero terms times the matching query weight
+        sims = np.bincount(self.rows, weights=self.data * dense_query[self.cols], minlength=len(self.person_names))
+        return {name: float(sims[self._row[name]]) for name in names}
+
+    def scores(self, text, person_names=None):
+        """Relevance 0-100 from the absolute similarity (see LOCAL_FULL_SCORE_SIMILARITY, LOCAL_MIN_SCORE)."""
+        sims = self.similarities(text, person_names)
+        return {
+            name: int(round(LOCAL_MIN_SCORE + (100 - LOCAL_MIN_SCORE)
+                            * min(1.0, max(0.0, sim) / LOCAL_FULL_SCORE_SIMILARITY)))
+            for name, sim in sims.items()
+        }
+
+
+_default_bidder = None
+_default_versions = None
+
+
+def get_bidder():
+    """Process-wide bidder built from the registry's personas; rebuilt when a persona prompt changes."""
+    global _default_bidder, _default_versions
+    prompts = get_registry()
+    names = prompts.persona_names()
+    versions = tuple((name, prompts.version(name + PERSONA_SUFFIX)) for name in names)
+    if _default_bidder is None or versions != _default_versions:
+        _default_bidder = LocalBidder({name: prompts.persona(name) for name in names})
+        _default_versions = versions
+    return _default_bidder
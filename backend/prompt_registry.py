@@ -0,0 +1,120 @@
+"""
+In-memory registry of the prompt templates and persona prompts in config/.
+
+Bids and replies used to open config/*.txt on every call. The registry reads each file
+once and serves it from memory. At most every PROMPT_CHECK_SECONDS a lookup stats the
+file; if its mtime or size changed the file is re-read, and the entry is replaced (and
+its version bumped) only when the content hash differs. Prompts can therefore be edited
+while the simulation runs. Derived prompts, such as persona + action prompt for a
+reply, are cached per combination of source versions.
+"""
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CONFIG_DIR = REPO_ROOT / "config"
+PERSONA_SUFFIX = "_persona_prompt.txt"
+ACTION_PROMPT = "sys_prompt.txt"
+BIDDING_PROMPT = "bidding_sys_prompt.txt"
+BATCH_BIDDING_PROMPT = "batch_bidding_sys_prompt.txt"
+
+PROMPT_CHECK_SECONDS = float(os.environ.get("PROMPT_CHECK_SECONDS", "1.0"))
+
+
+class PromptRegistry:
+    """Prompt files by name, loaded once and reloaded only when they change. Safe to share across threads."""
+
+    def __init__(self, config_dir=CONFIG_DIR, check_seconds=PROMPT_CHECK_SECONDS):
+        self.config_dir = Path(config_dir)
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._entries = {}  # name -> {"text", "version", "sha", "stat", "checked_at"}
+        self._derived = {}  # key -> (source versions, value)
+        self.reloads = 0
+
+    def _load(self, name, entry):
+        """Create or refresh the entry for `name` (caller holds the lock)."""
+        path = self.config_dir / name
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Prompt not found: {path}") from None
+        stat_key = (st.st_mtime_ns, st.st_size)
+        if entry is not None and entry["stat"] == stat_key:
+            return entry
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        sha = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if entry is not None and entry["sha"] == sha:
+            entry["stat"] = stat_key  # touched, not changed
+            return entry
+        if entry is not None:
+            self.reloads += 1
+            print(f"Reloaded prompt {name}")
+        entry = {"text": text, "version": (entry["version"] + 1) if entry else 1, "sha": sha, "stat": stat_key}
+        self._entries[name] = entry
+        return entry
+
+    def _entry(self, name):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or now - entry["checked_at"] >= self.check_seconds:
+                entry = self._load(name, entry)
+                entry["checked_at"] = now
+            return entry
+
+    def get(self, name):
+        """Text of config/<name>."""
+        return self._entry(name)["text"]
+
+    def version(self, name):
+        return self._entry(name)["version"]
+
+    def persona(self, person_name):
+        return self.get(f"{person_name}{PERSONA_SUFFIX}")
+
+    def persona_names(self):
+        return sorted(path.name[:-len(PERSONA_SUFFIX)] for path in self.config_dir.glob(f"*{PERSONA_SUFFIX}"))
+
+    def derived(self, key, names, build):
+        """build(*texts) for the prompt files `names`, rebuilt only when one of them changes."""
+        entries = [self._entry(name) for name in names]
+        versions = tuple(entry["version"] for entry in entries)
+        with self._lock:
+            cached = self._derived.get(key)
+            if cached is not None and cached[0] == versions:
+                return cached[1]
+        value = build(*(entry["text"] for entry in entries))
+        with self._lock:
+            self._derived[key] = (versions, value)
+        return value
+
+    def agent_sys_prompt(self, person_name):
+        """Reply system prompt: persona prompt followed by the shared action prompt."""
+        return self.derived(
+            ("agent", person_name), (f"{person_name}{PERSONA_SUFFIX}", ACTION_PROMPT), lambda persona, action: persona + action
+        )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "prompts": {name: {"version": e["version"], "sha": e["sha"][:12]} for name, e in self._entries.items()},
+                "reloads": self.reloads,
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Process-wide registry for config/."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PromptRegistry()
+        return _registry
@@ -0,0 +1,174 @@
+"""
+Content-addressed cache for LLM responses (used for bid scoring).
+
+A bid is a pure function of its inputs (persona prompt, bidding prompt with credits,
+recent history, model), so the key is a SHA-256 of those inputs. Entries live in an
+in-memory LRU and as one JSON file each under data/cache/<namespace>/, so replays
+and restarts reuse earlier answers. Both tiers evict by TTL and by entry count.
+
+Set LLM_CACHE_DISABLED=1 (or pass use_cache=False) for runs that need live sampling.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+CACHE_DIR = REPO_ROOT / "data" / "cache"
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "2048"))
+DEFAULT_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+# Disk eviction lists the directory, so it runs once per this many writes
+DISK_SWEEP_EVERY = 64
+
+
+def cache_disabled():
+    """True when the LLM_CACHE_DISABLED env var asks for live sampling on every call."""
+    return os.environ.get("LLM_CACHE_DISABLED", "").strip().lower() in ("1", "true", "yes")
+
+
+def make_key(*parts):
+    """Hash the inputs into a stable hex key. Parts are joined with a separator that cannot occur in text."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU backed by an on-disk directory, with TTL and size-based eviction."""
+
+    def __init__(self, namespace, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 cache_dir=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.dir = Path(cache_dir or CACHE_DIR) / namespace
+        self._memory = OrderedDict()  # key -> (stored_at, value), oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._puts = 0
+
+    def _path(self, key):
+        return self.dir / f"{key}.json"
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def get(self, key):
+        """Return the cached value or None. A disk hit is promoted into memory."""
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                stored_at, value = item
+                if not self._expired(stored_at, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            stored_at, value = entry["stored_at"], entry["value"]
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        if self._expired(stored_at, now):
+            self._remove_file(path)
+            with self._lock:
+                self.misses += 1
+            return None
+        # Touch so the on-disk LRU order follows reads, not just writes
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self._remember(key, stored_at, value)
+            self.hits += 1
+            self.disk_hits += 1
+        return value
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            tmp = self._path(key).with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": now, "value": value}, f)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            print(f"Warning: could not write cache entry {key}: {e}")
+            return
+        with self._lock:
+            self._puts += 1
+            sweep = self._puts % DISK_SWEEP_EVERY == 1
+        if sweep:
+            self._evict_disk()
+
+    def _remember(self, key, stored_at, value):
+        """Insert into the memory LRU (caller holds the lock)."""
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _remove_file(self, path):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def _evict_disk(self):
+        """Drop expired files, then the least recently used ones beyond max_entries."""
+        try:
+            files = [(p.stat().st_mtime, p) for p in self.dir.glob("*.json")]
+        except OSError:
+            return
+        if len(files) <= self.max_entries and self.ttl_seconds <= 0:
+            return
+        now = time.time()
+        files.sort()
+        keep = []
+        for mtime, path in files:
+            if self._expired(mtime, now):
+                self._remove_file(path)
+                with self._lock:
+                    self.evictions += 1
+            else:
+                keep.append(path)
+        for path in keep[:max(0, len(keep) - self.max_entries)]:
+            self._remove_file(path)
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for path in self.dir.glob("*.json"):
+            self._remove_file(path)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "entries_in_memory": len(self._memory),
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -1,7 +1,12 @@
 """
-Web server for Agentic Social: world_chat UI. Runs run.py on startup
+Web server for Agentic Social: world_chat UI. Runs the simulation on startup
 and streams new lines from data/conversational_history.txt to the UI.
+
+By default the simulation runs in-process (simulation_stream), so reply tokens are
+pushed to /api/history/stream as `chunk` events while they are generated.
+With --subprocess it runs run.py instead and only finished lines are streamed.
 """
+import asyncio
 import json
 import os
 import signal
@@ -50,128 +55,174 @@ FRONTEND_DIR = REPO_ROOT / "frontend"
 CONFIG_DIR = REPO_ROOT / "config"
 DATA_DIR = REPO_ROOT / "data"
 
-from fastapi import FastAPI
-from fastapi.responses import FileResponse, StreamingResponse
+from broadcast import hub
+from history_store import get_store
+from static_assets import GZIP_MIN_SIZE, IMMUTABLE_CACHE_CONTROL, accepts_gzip, get_bundle, gzip_bytes
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 app = FastAPI(title="Agentic Social – world_chat")
 
 _run_process = None
+_simulation_thread = None
 
 
-def _load_history():
-    """Return list of {role, content, timestamp} from conversational_history.txt."""
-    if not HISTORY_FILE.exists():
-        return []
-    out = []
-    try:
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            for i, line in enumerate(lines):
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    entry = json.loads(line)
-                    # Use timestamp from entry, or generate one based on line position
-                    timestamp = entry.get("timestamp")
-                    if not timestamp:
-                        # Estimate timestamp: assume messages are ~3 seconds apart
-                        from datetime import datetime, timedelta
-                        base_time = datetime.utcnow() - timedelta(seconds=len(lines) * 3)
-                        timestamp = (base_time + timedelta(seconds=i * 3)).isoformat() + "Z"
-                    out.append({
-                        "role": entry.get("role", ""),
-                        "content": entry.get("content", ""),
-                        "timestamp": timestamp
-                    })
-                except json.JSONDecodeError:
-                    continue
-    except OSError:
-        return []
-    return out
+# /api/history page size: default, and the most a client may ask for
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_PAGE_SIZE = 500
 
 
-def _stream_new_lines():
-    """Generator: poll HISTORY_FILE and yield SSE only for new lines (since connection)."""
-    # Start from current line count so we only send lines added after client connected
+def _load_history(after=None, before=None, limit=HISTORY_PAGE_SIZE, history=None):
+    """
+    Return (messages, next_cursor) for one page of the history, cursor = sequence id.
+    after=N: the oldest `limit` messages with seq > N; next_cursor continues forwards.
+    before=N: the newest `limit` messages with seq < N; next_cursor continues backwards.
+    Neither: the latest page; next_cursor is the `before` for the next older page.
+    next_cursor is None when there is nothing further in that direction.
+    """
+    history = history or get_store()
+    # One extra entry tells whether another page exists
     try:
-        if HISTORY_FILE.exists():
-            with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                last_count = sum(1 for ln in f if ln.strip())
+        if after is not None:
+            entries = history.since(after, limit + 1)
+            more = len(entries) > limit
+            entries = entries[:limit]
+            next_cursor = entries[-1]["seq"] if more else None
         else:
-            last_count = 0
+            entries = history.tail(limit + 1) if before is None else history.before(before, limit + 1)
+            more = len(entries) > limit
+            entries = entries[-limit:]
+            next_cursor = entries[0]["seq"] if more else None
     except OSError:
-        last_count = 0
-    while True:
-        try:
-            if HISTORY_FILE.exists():
-                with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-                    lines = [ln.strip() for ln in f if ln.strip()]
-                for i in range(last_count, len(lines)):
-                    try:
-                        entry = json.loads(lines[i])
-                        from datetime import datetime
-                        timestamp = entry.get("timestamp") or datetime.utcnow().isoformat() + "Z"
-                        ev = {
-                            "type": "message",
-                            "role": entry.get("role", ""),
-                            "content": entry.get("content", ""),
-                            "timestamp": timestamp
-                        }
-                        yield f"data: {json.dumps(ev)}\n\n"
-                    except json.JSONDecodeError:
-                        pass
-                last_count = len(lines)
-        except OSError:
-            pass
-        time.sleep(0.5)
+        return [], None
+    # seq and timestamp are stamped at write time and never change, so pages are stable
+    # (lines written before that carry no timestamp and report null)
+    out = [{
+        "seq": entry["seq"],
+        "role": entry.get("role", ""),
+        "content": entry.get("content", ""),
+        "timestamp": entry.get("timestamp"),
+    } for entry in entries]
+    return out, next_cursor
+
+
+def _not_modified(request, etag):
+    return etag in (request.headers.get("if-none-match") or "")
 
 
 @app.get("/")
 async def serve_index():
-    """Serve the main UI (world_chat)."""
-    index_path = FRONTEND_DIR / "index.html"
-    if not index_path.exists():
+    """Serve the main UI (world_chat), pointing at the fingerprinted assets."""
+    index_html = get_bundle().index_html
+    if index_html is None:
         return {"error": "Frontend files not found."}
-    return FileResponse(index_path)
+    return HTMLResponse(index_html, headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/assets/{name}")
+async def serve_asset(name: str, request: Request):
+    """Fingerprinted app.js / styles.css: cached for a year, gzipped once at build time."""
+    asset = get_bundle().get(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found.")
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": asset["etag"], "Vary": "Accept-Encoding"}
+    if _not_modified(request, asset["etag"]):
+        return Response(status_code=304, headers=headers)
+    body = asset["body"]
+    if asset["gzip"] is not None and accepts_gzip(request.headers.get("accept-encoding")):
+        body = asset["gzip"]
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, media_type=asset["media_type"], headers=headers)
 
 
 @app.get("/api/history")
-async def api_history():
-    """Return full conversation history (for initial page load)."""
-    return {"messages": _load_history()}
+async def api_history(request: Request, after: int = None, before: int = None, limit: int = HISTORY_PAGE_SIZE):
+    """
+    One page of the conversation history, oldest first. Without a cursor this is the
+    latest page; pass next_cursor back as `before` to load older messages.
+    Sends an ETag (history version + query) and answers If-None-Match with 304.
+    """
+    if after is not None and before is not None:
+        raise HTTPException(status_code=400, detail="Use either 'after' or 'before', not both.")
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    history = get_store()
+    # Weak: the same page may be sent gzipped or not
+    etag = f'W/"{history.version()}-{after}-{before}-{limit}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    messages, next_cursor = _load_history(after=after, before=before, limit=limit, history=history)
+    body = json.dumps({"messages": messages, "next_cursor": next_cursor}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(body) >= GZIP_MIN_SIZE and accepts_gzip(request.headers.get("accept-encoding")):
+        body = gzip_bytes(body, level=6)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, media_type="application/json", headers=headers)
 
 
 @app.get("/api/history/stream")
 async def api_history_stream():
-    """SSE: emit new messages as they are appended to conversational_history.txt."""
-    def gen():
-        for chunk in _stream_new_lines():
-            yield chunk
-
+    """
+    SSE: emit new messages as they are appended to conversational_history.txt, plus
+    message_start / chunk / message_end events while an in-process reply is generated.
+    All clients share one history watcher (see broadcast.py); each gets its own queue.
+    """
     return StreamingResponse(
-        gen(),
+        hub.stream(),
         media_type="text/event-stream",
         headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Connection": "keep-alive"},
     )
 
 
+@app.get("/api/history/stream/stats")
+async def api_history_stream_stats():
+    """SSE broadcast stats: subscriber count, events published/dropped, fan-out latency."""
+    return hub.stats()
+
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/llm/connections")
+async def api_llm_connections():
+    """Pooled LLM client stats: new handshakes vs requests on reused keep-alive connections."""
+    import llm_clients
+    return llm_clients.connection_stats()
+
+
+@app.get("/api/llm/breakers")
+async def api_llm_breakers():
+    """Circuit breaker state per model (closed / open / half_open) and counters."""
+    import circuit_breaker
+    return circuit_breaker.breaker_states()
+
+
+@app.get("/api/llm/hedging")
+async def api_llm_hedging():
+    """Hedged request stats: hedge rate, which request won, total hedge delay."""
+    import hedging
+    return hedging.hedging_stats()
+
+
+@app.get("/api/llm/cache")
+async def api_llm_cache():
+    """Bid response cache hit/miss counters."""
+    import utils
+    return utils.bid_cache.stats()
+
+
 if FRONTEND_DIR.exists():
     app.mount("/static", StaticFiles(directory=str(FRONTEND_DIR)), name="static")
 
 
 def _ensure_history_file_exists():
     """Ensure conversational_history.txt exists with at least one line so run.py can read last speaker."""
-    HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
-    if not HISTORY_FILE.exists() or HISTORY_FILE.stat().st_size == 0:
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            f.write('{"role": "Gaurav", "content": "Conversation started."}\n')
+    history = get_store()
+    if history.count() == 0:
+        history.append("Gaurav", "Conversation started.")
         print("Created empty conversational_history.txt with one seed line for run.py.")
 
 
@@ -207,19 +258,74 @@ def _start_run_py():
     print("Started run.py in background (PID %s). Check stderr for [run.py] if history is not updating." % _run_process.pid)
 
 
+def _warm_up_llm_clients():
+    """Open pooled provider connections in the background so startup is not blocked."""
+    def warm():
+        try:
+            import utils
+            utils.warm_up_clients()
+        except Exception as e:
+            print(f"Warning: LLM client warm-up skipped: {e}")
+
+    threading.Thread(target=warm, daemon=True).start()
+
+
+def _start_simulation_thread():
+    """Run simulation_stream in a background thread and publish its events to SSE clients."""
+    global _simulation_thread
+    if _simulation_thread is not None and _simulation_thread.is_alive():
+        return
+    _ensure_history_file_exists()
+
+    def run():
+        from simulation_stream import run_simulation_stream
+        for ev in run_simulation_stream(max_rounds=None):
+            if ev.get("type") == "error":
+                sys.stderr.write("[simulation] " + ev.get("detail", "") + "\n")
+            hub.publish(ev)
+            if ev.get("type") == "message_end":
+                # The reply was just appended to the history; let the watcher pick it up now
+                hub.notify()
+
+    _simulation_thread = threading.Thread(target=run, daemon=True)
+    _simulation_thread.start()
+    print("Started in-process simulation; reply tokens stream to the UI as they are generated.")
+
+
+# Set from --subprocess (or SIMULATION_MODE=subprocess) to run run.py instead of the in-process stream
+SIMULATION_MODE = os.environ.get("SIMULATION_MODE", "inprocess")
+
+
 @app.on_event("startup")
 async def startup():
-    _start_run_py()
+    hub.start(asyncio.get_running_loop())
+    _warm_up_llm_clients()
+    if SIMULATION_MODE == "subprocess":
+        _start_run_py()
+    else:
+        _start_simulation_thread()
     print("Agentic Social – world_chat")
     print("  UI: http://localhost:8001")
-    print("  run.py is running in background; new lines in data/conversational_history.txt stream to the UI.")
+    print("  Simulation is running in background; new lines in data/conversational_history.txt stream to the UI.")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    hub.stop()
+    import llm_clients
+    llm_clients.close_all()
 
 
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Agentic Social world_chat server")
     parser.add_argument("--free-port", action="store_true", help="Kill process on port 8001 before starting")
+    parser.add_argument("--subprocess", action="store_true",
+                        help="Run run.py as a subprocess instead of the in-process token-streaming simulation")
     args = parser.parse_args()
+    global SIMULATION_MODE
+    if args.subprocess:
+        SIMULATION_MODE = "subprocess"
     if args.free_port:
         _free_port(8001)
     import uvicorn
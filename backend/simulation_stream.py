@@ -1,89 +1,110 @@
 """
 Streaming version of the run.py simulation for the web UI.
-Yields SSE-style events (message_start, message_end, done, error) so the server can stream to the client.
-Uses the same utils and agent scripts as run.py.
+Yields SSE-style events (message_start, chunk, message_end, done, error) so the server can stream to the client.
+Uses the same utils, bidding and resident agents as run.py; replies are streamed token by token.
 """
-import json
 import os
 import sys
 from pathlib import Path
 
+from agent import PERSON_ROLE, ROLE_PERSON, get_agent
+from history_store import get_store
+from summary_memory import get_memory
+
 REPO_ROOT = Path(__file__).resolve().parent.parent
 BACKEND_DIR = Path(__file__).resolve().parent
 HISTORY_FILE = REPO_ROOT / "data" / "conversational_history.txt"
 CONFIG_DIR = REPO_ROOT / "config"
 
-# Same as run.py
-PERSON_ROLE = {
-    "Gaurav_Atavale": "Gaurav",
-    "Anagha_Palandye": "Anagha",
-    "Kanishkha_S": "Kanishkha",
-    "Nirbhay_R": "Nirbhay",
-}
-ROLE_PERSON = {v: k for k, v in PERSON_ROLE.items()}
-FILE_NAMES = {
-    "Gaurav_Atavale": BACKEND_DIR / "agent_Gaurav.py",
-    "Anagha_Palandye": BACKEND_DIR / "agent_Anagha.py",
-    "Kanishkha_S": BACKEND_DIR / "agent_Kanishkha.py",
-    "Nirbhay_R": BACKEND_DIR / "agent_Nirbhay.py",
-}
 INITIAL_CREDITS = 100
 BID_MODEL_PRIMARY = "claude-3-5-sonnet-20240620"
 BID_MODEL_FALLBACK = "llama-3.1-8b-instant"
+# None uses bidding.BID_MODE (env BID_MODE): "per_persona", "batch" or "local" (no LLM)
+BID_MODE = None
+# Rounds in a row in which only the last speaker bids (it cannot speak twice) before the run ends
+MAX_IDLE_ROUNDS = 3
 
 
 def _ensure_history_file():
     """Ensure history file exists with at least one line so we can derive init_person."""
-    if not HISTORY_FILE.exists() or HISTORY_FILE.stat().st_size == 0:
-        HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+    history = get_store()
+    if history.count() == 0:
         first_person = list(PERSON_ROLE.keys())[0]
-        role = PERSON_ROLE[first_person]
-        with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-            f.write(json.dumps({"role": role, "content": "Conversation started."}) + "\n")
+        history.append(PERSON_ROLE[first_person], "Conversation started.")
 
 
 def _read_last_speaker():
     """Return (person_key, credits_dict) for current state."""
     _ensure_history_file()
-    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    if not lines:
-        return list(PERSON_ROLE.keys())[0], {k: INITIAL_CREDITS for k in PERSON_ROLE}
-    try:
-        last = json.loads(lines[-1].strip())
-        role = last.get("role", "").strip()
+    last = get_store().last()
+    init_person = None
+    if last is not None:
+        role = str(last.get("role") or "").strip()
         init_person = ROLE_PERSON.get(role)
-    except (json.JSONDecodeError, TypeError):
-        init_person = None
     if init_person is None:
         init_person = list(PERSON_ROLE.keys())[0]
     credits = {k: INITIAL_CREDITS for k in PERSON_ROLE}
     return init_person, credits
 
 
-def _read_last_message_line():
-    """Read the last line of the history file (the message just appended by an agent)."""
-    if not HISTORY_FILE.exists():
-        return None, None
-    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    if not lines:
-        return None, None
+def _stream_agent_reply(person_name):
+    """
+    Generator: stream one agent reply as chunk events, then append it to the history file.
+    Uses the persona's resident Agent (same prompts, models and "Name:" cleanup) but yields deltas as they arrive.
+    The fallback model is used only if the primary fails before producing any text,
+    or straight away while the primary's circuit breaker is open.
+    """
+    import circuit_breaker
+    import utils
+
+    agent = get_agent(person_name)
+    role = agent.role
+    yield {"type": "message_start", "speaker": role}
     try:
-        entry = json.loads(lines[-1].strip())
-        return entry.get("role"), entry.get("content", "")
-    except (json.JSONDecodeError, TypeError):
-        return None, None
+        sys_prompt = agent.sys_prompt
+        conversation_hist_format = utils.format_history_for("reply")
+        parts = []
+        models = [agent.fallback_model]
+        if circuit_breaker.get_breaker(agent.primary_model).allow_request():
+            models.insert(0, agent.primary_model)
+        for model in models:
+            breaker = circuit_breaker.get_breaker(model)
+            stripper = utils.SpeakerPrefixStripper()
+            try:
+                for delta in utils.agent_sim_stream(model, sys_prompt, conversation_hist_format, profile="reply"):
+                    visible = stripper.feed(delta)
+                    if visible:
+                        parts.append(visible)
+                        yield {"type": "chunk", "speaker": role, "delta": visible}
+            except Exception:
+                breaker.record_failure()
+                if parts or model == agent.fallback_model:
+                    raise
+                continue
+            breaker.record_success()
+            tail = stripper.finish()
+            if tail:
+                parts.append(tail)
+                yield {"type": "chunk", "speaker": role, "delta": tail}
+            break
+        text = "".join(parts)
+        entry = get_store().append(role, text)
+        get_memory().maybe_update()
+    except Exception as e:
+        yield {"type": "message_end", "speaker": role, "text": f"[Error: {e}]"}
+    else:
+        yield {"type": "message_end", "speaker": role, "text": text or "(no response)",
+               "seq": entry["seq"], "timestamp": entry["timestamp"]}
 
 
 def run_simulation_stream(max_rounds=15, pause_seconds=0):
     """
     Generator that runs the bidding simulation and yields SSE-style dicts.
     Each yield is a dict with 'type' and other fields; the server will serialize as "data: {json}\n\n".
-    Uses existing utils and exec(agent_*.py).
+    max_rounds=None runs until every persona is out of credits, like run.py.
     """
     import time
-    import utils
+    import bidding
 
     orig_cwd = os.getcwd()
     try:
@@ -95,22 +116,22 @@ def run_simulation_stream(max_rounds=15, pause_seconds=0):
     try:
         init_person, credits_left = _read_last_speaker()
         round_count = 0
-
-        while round_count < max_rounds and any(credits_left[k] > 0 for k in credits_left):
-            random_numbers = {}
-            for key in PERSON_ROLE:
-                if credits_left[key] > 0:
-                    try:
-                        llm_bid = utils.generate_bid_score_each_user(key, credits_left, BID_MODEL_PRIMARY)
-                        random_numbers[key] = int(0.01 * float(json.loads(llm_bid)["score"]) * credits_left[key])
-                    except Exception:
-                        try:
-                            llm_bid = utils.generate_bid_score_each_user(key, credits_left, BID_MODEL_FALLBACK)
-                            random_numbers[key] = int(0.01 * float(json.loads(llm_bid)["score"]) * credits_left[key])
-                        except Exception:
-                            random_numbers[key] = 0
-                else:
-                    random_numbers[key] = 0
+        missed_rounds = 0
+        idle_rounds = 0
+
+        while (max_rounds is None or round_count < max_rounds) and any(credits_left[k] > 0 for k in credits_left):
+            missed = set()
+            random_numbers = bidding.collect_bids(
+                list(PERSON_ROLE), credits_left, BID_MODEL_PRIMARY, BID_MODEL_FALLBACK, mode=BID_MODE, missed=missed
+            )
+
+            # Every bid timed out or failed: skip the round instead of ending the simulation
+            if bidding.round_missed(random_numbers, missed) and missed_rounds < bidding.MAX_MISSED_ROUNDS:
+                missed_rounds += 1
+                print(f"Warning: no bids arrived this round (missed: {sorted(missed)}). Skipping it.")
+                bidding.backoff_after_missed_round(missed_rounds)
+                continue
+            missed_rounds = 0
 
             if all(v == 0 for v in random_numbers.values()):
                 break
@@ -120,23 +141,10 @@ def run_simulation_stream(max_rounds=15, pause_seconds=0):
 
             if winning_bid > 0 and selected_person != init_person:
                 credits_left[selected_person] = max(0, credits_left[selected_person] - winning_bid)
-                role = PERSON_ROLE[selected_person]
-                agent_script = FILE_NAMES.get(selected_person)
-                if not agent_script or not agent_script.exists():
-                    round_count += 1
-                    continue
-                yield {"type": "message_start", "speaker": role}
-                try:
-                    with open(agent_script, "r") as f:
-                        exec(f.read(), {"REPO_ROOT": REPO_ROOT, "HISTORY_FILE": HISTORY_FILE, "__file__": str(agent_script)})
-                except Exception as e:
-                    yield {"type": "message_end", "speaker": role, "text": f"[Error: {e}]"}
-                else:
-                    _, text = _read_last_message_line()
-                    yield {"type": "message_end", "speaker": role, "text": text or "(no response)"}
+                yield from _stream_agent_reply(selected_person)
                 init_person = selected_person
                 round_count += 1
-                if pause_seconds > 0 and round_count < max_rounds:
+                if pause_seconds > 0 and (max_rounds is None or round_count < max_rounds):
                     time.sleep(pause_seconds)
             elif selected_person == init_person:
                 second = max((k for k in random_numbers if k != selected_person), key=random_numbers.get, default=None)
@@ -144,26 +152,21 @@ def run_simulation_stream(max_rounds=15, pause_seconds=0):
                     selected_person = second
                     winning_bid = random_numbers[selected_person]
                     credits_left[selected_person] = max(0, credits_left[selected_person] - winning_bid)
-                    role = PERSON_ROLE[selected_person]
-                    agent_script = FILE_NAMES.get(selected_person)
-                    if agent_script and agent_script.exists():
-                        yield {"type": "message_start", "speaker": role}
-                        try:
-                            with open(agent_script, "r") as f:
-                                exec(f.read(), {"REPO_ROOT": REPO_ROOT, "HISTORY_FILE": HISTORY_FILE, "__file__": str(agent_script)})
-                        except Exception as e:
-                            yield {"type": "message_end", "speaker": role, "text": f"[Error: {e}]"}
-                        else:
-                            _, text = _read_last_message_line()
-                            yield {"type": "message_end", "speaker": role, "text": text or "(no response)"}
-                        init_person = selected_person
-                        round_count += 1
-                        if pause_seconds > 0 and round_count < max_rounds:
-                            time.sleep(pause_seconds)
+                    yield from _stream_agent_reply(selected_person)
+                    init_person = selected_person
+                    round_count += 1
+                    if pause_seconds > 0 and (max_rounds is None or round_count < max_rounds):
+                        time.sleep(pause_seconds)
                 else:
                     round_count += 1
+                    idle_rounds += 1
+                    # Deterministic bids (BID_MODE=local) would repeat this round forever
+                    if idle_rounds >= MAX_IDLE_ROUNDS:
+                        break
+                    continue
             else:
                 round_count += 1
+            idle_rounds = 0
 
         yield {"type": "done"}
     except Exception as e:
@@ -0,0 +1,100 @@
+"""
+Fingerprinted, precompressed frontend assets.
+
+index.html references /static/app.js and /static/styles.css. The server rewrites those
+references to /assets/app.<hash>.js and /assets/styles.<hash>.css, where <hash> is taken
+from the file contents, so the assets can be cached "forever" (max-age one year,
+immutable): a changed file gets a new URL. Each asset is gzipped once when it is built,
+not per request. Sources are re-read only when their mtime changes, so editing the
+frontend while the server runs still works; index.html itself is served with no-cache.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+FRONTEND_DIR = REPO_ROOT / "frontend"
+ASSET_NAMES = ("app.js", "styles.css")
+ASSET_URL_PREFIX = "/assets/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MEDIA_TYPES = {".js": "application/javascript", ".css": "text/css"}
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+
+
+def gzip_bytes(data, level=9):
+    """Deterministic gzip (mtime=0); level 9 for build-time assets, lower for per-request bodies."""
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def accepts_gzip(accept_encoding):
+    return "gzip" in (accept_encoding or "").lower()
+
+
+class AssetBundle:
+    """Built assets for one frontend directory: {url name: asset} plus the rewritten index.html."""
+
+    def __init__(self, frontend_dir=FRONTEND_DIR, names=ASSET_NAMES):
+        self.frontend_dir = Path(frontend_dir)
+        self.names = names
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self.assets = {}
+        self.index_html = None
+
+    def _current_mtimes(self):
+        mtimes = []
+        for name in self.names + ("index.html",):
+            try:
+                mtimes.append(os.stat(self.frontend_dir / name).st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def refresh(self):
+        """Rebuild if any source changed since the last build."""
+        mtimes = self._current_mtimes()
+        with self._lock:
+            if mtimes == self._mtimes:
+                return self
+            assets = {}
+            urls = {}
+            for name in self.names:
+                path = self.frontend_dir / name
+                if not path.exists():
+                    continue
+                data = path.read_bytes()
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                stem, suffix = os.path.splitext(name)
+                url_name = f"{stem}.{digest}{suffix}"
+                assets[url_name] = {
+                    "body": data,
+                    "gzip": gzip_bytes(data) if len(data) >= GZIP_MIN_SIZE else None,
+                    "media_type": MEDIA_TYPES.get(suffix, "application/octet-stream"),
+                    "etag": f'"{digest}"',
+                }
+                urls[f"/static/{name}"] = ASSET_URL_PREFIX + url_name
+            index_path = self.frontend_dir / "index.html"
+            index_html = index_path.read_text(encoding="utf-8") if index_path.exists() else None
+            if index_html is not None:
+                for original, fingerprinted in urls.items():
+                    index_html = index_html.replace(f'"{original}"', f'"{fingerprinted}"')
+            self.assets = assets
+            self.index_html = index_html
+            self._mtimes = mtimes
+        return self
+
+    def get(self, url_name):
+        return self.refresh().assets.get(url_name)
+
+
+_bundle = None
+
+
+def get_bundle():
+    global _bundle
+    if _bundle is None:
+        _bundle = AssetBundle()
+    return _bundle.refresh()
@@ -0,0 +1,172 @@
+"""
+Rolling summary memory for long conversations.
+
+Prompts carry only the newest messages (see utils.format_history_for): the summary,
+then the messages after the last one it covers (through_seq), within each call kind's
+token budget. The fold boundary follows that window. Once the messages not yet
+summarised fill SUMMARY_TRIGGER of the tightest window (smallest token budget, or
+HISTORY_MAX_TURNS lines), all but the newest ones fitting SUMMARY_KEEP of it are folded
+into the summary by one LLM call (profile "summary", prompt config/summary_sys_prompt.txt).
+Folding before the window is full means no message drops out of the prompt unsummarised,
+and the window starts after through_seq so none is shown twice. The summary is stored
+beside the history in SUMMARY_FILE.
+
+Folding runs on a background thread: maybe_update() is called after each append and
+only schedules work, so it never delays a bid or a reply. Set HISTORY_SUMMARY=0 to
+turn it off.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from history_store import REPO_ROOT, get_store
+
+SUMMARY_ENABLED = os.environ.get("HISTORY_SUMMARY", "1").strip().lower() not in ("0", "false", "no")
+SUMMARY_FILE = Path(os.environ.get("SUMMARY_FILE", str(REPO_ROOT / "data" / "conversation_summary.json")))
+# Fold once unsummarised messages fill this fraction of the tightest history window...
+SUMMARY_TRIGGER = float(os.environ.get("SUMMARY_TRIGGER", "0.75"))
+# ...keeping verbatim only the newest messages that fit this fraction of it
+SUMMARY_KEEP = float(os.environ.get("SUMMARY_KEEP", "0.25"))
+# At most this many messages per summarizer call; a bigger backlog takes several calls
+SUMMARY_MAX_BATCH = 60
+SUMMARY_PROMPT = "summary_sys_prompt.txt"
+SUMMARY_MODEL_PRIMARY = "claude-3-5-sonnet-20240620"
+SUMMARY_MODEL_FALLBACK = "llama-3.1-8b-instant"
+
+
+class SummaryMemory:
+    """Running summary of everything up to `through_seq`, persisted as JSON."""
+
+    def __init__(self, path=SUMMARY_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        self._pending = None
+        self._mtime = None
+        self.state = {"summary": "", "through_seq": 0, "updated_at": None}
+
+    def _reload(self):
+        """Pick up a summary written by another process (caller holds the lock)."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: could not read summary memory {self.path}: {e}")
+        self._mtime = mtime
+
+    def _save(self, state):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def current(self):
+        """(summary text, through_seq); ("", 0) until the first fold."""
+        with self._lock:
+            self._reload()
+            return self.state["summary"], self.state["through_seq"]
+
+    def maybe_update(self):
+        """Schedule a fold if the unsummarised messages are about to outgrow the prompt window. Returns at once."""
+        if not SUMMARY_ENABLED:
+            return
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return
+            self._reload()
+            history = get_store()
+            last_seq = history.last_seq()
+            if self.state["through_seq"] > last_seq:
+                # History was truncated or replaced; start over
+                self.state = {"summary": "", "through_seq": 0, "updated_at": None}
+            fold_through = self._fold_boundary(history, last_seq, self.state["through_seq"])
+            if fold_through is None:
+                return
+            self._pending = self._executor.submit(self._fold, fold_through)
+
+    @staticmethod
+    def _fold_boundary(history, last_seq, through_seq):
+        """Last seq to fold, from what the tightest prompt window shows after `through_seq`; None if no fold is due."""
+        import utils
+
+        budget = min(utils.HISTORY_TOKEN_BUDGETS.values())
+        turns = utils.HISTORY_MAX_TURNS
+        shown, _, used = utils.history_window(history, turns, budget, through_seq)
+        if (len(shown) == last_seq - through_seq and used < SUMMARY_TRIGGER * budget
+                and len(shown) < SUMMARY_TRIGGER * turns):
+            return None
+        keep, _, _ = utils.history_window(history, max(1, int(SUMMARY_KEEP * turns)),
+                                          int(SUMMARY_KEEP * budget), through_seq)
+        fold_through = keep[0]["seq"] - 1 if keep else last_seq
+        return fold_through if fold_through > through_seq else None
+
+    def _fold(self, fold_through):
+        """Fold messages (through_seq, fold_through] into the summary, in batches."""
+        import utils
+        from circuit_breaker import call_with_fallback
+        from prompt_registry import get_registry
+
+        try:
+            history = get_store()
+            while True:
+                with self._lock:
+                    summary, through_seq = self.state["summary"], self.state["through_seq"]
+                if through_seq >= fold_through:
+                    return
+                entries = history.since(through_seq, min(SUMMARY_MAX_BATCH, fold_through - through_seq))
+                if not entries:
+                    return
+                new_messages = "".join(f"{e.get('role', 'Unknown').capitalize()}: {e.get('content', '')}\n"
+                                       for e in entries)
+                sys_prompt = get_registry().get(SUMMARY_PROMPT)
+                user_query = f"Current summary:\n{summary or '(none yet)'}\n\nNew messages:\n{new_messages}"
+                updated = call_with_fallback(
+                    SUMMARY_MODEL_PRIMARY, SUMMARY_MODEL_FALLBACK,
+                    lambda model: utils.agent_sim(model, sys_prompt, user_query, profile="summary"),
+                )
+                state = {
+                    "summary": (updated or "").strip(),
+                    "through_seq": entries[-1]["seq"],
+                    "updated_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                }
+                with self._lock:
+                    self.state = state
+                    self._save(state)
+        except Exception as e:
+            print(f"Warning: summary memory update failed: {e}")
+
+    def prefix(self):
+        """
+        (summary block to put before the recent messages, last seq it covers); ("", 0) if
+        there is no summary yet. The recent messages must start after that seq.
+        """
+        if not SUMMARY_ENABLED:
+            return "", 0
+        summary, through_seq = self.current()
+        if not summary:
+            return "", through_seq
+        return f"Summary of the earlier conversation:\n{summary}\n\nRecent messages:\n", through_seq
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_memory():
+    """Process-wide summary memory."""
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = SummaryMemory()
+        return _memory
@@ -1,6 +1,10 @@
 import json
 import os
 import re
+import socket
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 
 # Paths relative to repo root
@@ -16,17 +20,107 @@ try:
 except ImportError:
     pass
 
-import anthropic
-from groq import Groq
+import hedging
+from history_store import get_store
+import llm_clients
+from prompt_registry import BATCH_BIDDING_PROMPT, BIDDING_PROMPT, get_registry
+from response_cache import ResponseCache, cache_disabled, make_key
+from summary_memory import get_memory
+
+# Bid responses are a pure function of their prompts and model; see response_cache.py
+bid_cache = ResponseCache("bids")
+
+
+# Rendered history blocks keyed by (store, history version, turns, max_tokens, after_seq); see format_history_as_string
+HISTORY_FORMAT_CACHE_SIZE = 16
+_history_format_cache = OrderedDict()
+_history_format_lock = threading.Lock()
+
+
+# Token budget for the history block per call kind (env HISTORY_TOKENS_<KIND> overrides).
+# The window grows newest-first until the budget or HISTORY_MAX_TURNS is reached, so
+# long messages shrink it and short exchanges get more context.
+HISTORY_TOKEN_BUDGETS = {
+    kind: int(os.environ.get(f"HISTORY_TOKENS_{kind.upper()}", default))
+    for kind, default in (("bid", 600), ("bid_batch", 900), ("reply", 1500))
+}
+HISTORY_MAX_TURNS = int(os.environ.get("HISTORY_MAX_TURNS", "40"))
+HISTORY_WINDOW_PAGE = 16
+CHARS_PER_TOKEN = 4
+
+
+def format_history_for(kind):
+    """
+    History block for a call kind ("bid", "bid_batch", "reply"): the running summary of
+    older messages (summary_memory.py), then the newest messages it does not cover, within
+    the kind's token budget. The summary folds messages before this window would drop them,
+    so every message is either summarised or shown verbatim, never both.
+    """
+    prefix, through_seq = get_memory().prefix()
+    recent = format_history_as_string(
+        turns=HISTORY_MAX_TURNS, max_tokens=HISTORY_TOKEN_BUDGETS[kind], after_seq=through_seq
+    )
+    return prefix + recent
+
+
+def history_content_for(kind):
+    """Text of the messages format_history_for(kind) shows verbatim, without role prefixes or the summary."""
+    _, through_seq = get_memory().prefix()
+    entries, _, _ = history_window(get_store(), HISTORY_MAX_TURNS, HISTORY_TOKEN_BUDGETS[kind], through_seq)
+    return "\n".join(entry.get("content", "") for entry in entries)
 
 
 def read_recent_history(turns=10):
-    if not HISTORY_FILE.exists():
-        return []
-    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-        recent_history = [json.loads(line) for line in lines[-turns:] if line.strip()]  # Last 'turns' turns
-    return recent_history
+    # Last 'turns' turns, from the shared indexed store (see history_store.py)
+    return get_store().tail(turns)
+
+
+def estimate_tokens(text):
+    """
+    Fast local token estimate (no tokenizer): ~4 characters per token for English prose,
+    but never fewer tokens than whitespace-separated words.
+    """
+    return max(len(text) // CHARS_PER_TOKEN, len(text.split())) + 1
+
+
+def _history_line(entry):
+    return f"{entry.get('role', 'Unknown').capitalize()}: {entry.get('content', '')}\n"
+
+
+def history_window(store, turns, max_tokens, after_seq=0):
+    """
+    The newest entries with seq > after_seq, at most `turns` of them and (if max_tokens is
+    set) at most that many estimated tokens, collected newest-first.
+    Returns (entries, rendered lines, estimated tokens used), oldest first.
+    """
+    if max_tokens is None and after_seq == 0:
+        entries = store.tail(turns)
+        lines = [_history_line(entry) for entry in entries]
+        return entries, lines, sum(estimate_tokens(line) for line in lines)
+    entries = []
+    lines = []
+    used = 0
+    page = store.tail(min(turns, HISTORY_WINDOW_PAGE))
+    while page:
+        for entry in reversed(page):
+            if entry["seq"] <= after_seq:
+                return entries[::-1], lines[::-1], used
+            line = _history_line(entry)
+            cost = estimate_tokens(line)
+            if max_tokens is not None and used + cost > max_tokens:
+                if not lines:
+                    # The newest message alone is over budget: keep its beginning
+                    entries.append(entry)
+                    lines.append(line[:max_tokens * CHARS_PER_TOKEN].rstrip() + " …\n")
+                    used = max_tokens
+                return entries[::-1], lines[::-1], used
+            entries.append(entry)
+            lines.append(line)
+            used += cost
+            if len(lines) >= turns:
+                return entries[::-1], lines[::-1], used
+        page = store.before(page[0]["seq"], min(turns - len(lines), HISTORY_WINDOW_PAGE))
+    return entries[::-1], lines[::-1], used
 
 
 # def format_history_as_string(turns = 10):
@@ -40,37 +134,30 @@ def read_recent_history(turns=10):
 #             formatted_string += f"{entry['role'].capitalize()}: {entry['content']}\n"
             
 #     return formatted_string
-def format_history_as_string(turns=10):
-    formatted_string = ""
-    
-    try:
-        if not HISTORY_FILE.exists():
-            return "No history found."
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            # Take the last N lines
-            lines = lines[-turns:]
-            
-            for line in lines:
-                # 1. Strip whitespace
-                line = line.strip()
-                
-                # 2. Skip if empty
-                if not line:
-                    continue
-                
-                try:
-                    entry = json.loads(line)
-                    role = entry.get('role', 'Unknown').capitalize()
-                    content = entry.get('content', '')
-                    formatted_string += f"{role}: {content}\n"
-                except json.JSONDecodeError:
-                    print(f"Skipping invalid JSON line: {line}")
-                    continue
-                    
-    except FileNotFoundError:
-        return "No history found."
-            
+def format_history_as_string(turns=10, max_tokens=None, after_seq=0):
+    """
+    Last `turns` entries as "Role: content" lines; with max_tokens, only as many of the
+    newest entries as fit that estimated token budget, and only entries with seq > after_seq
+    (the ones the running summary does not cover). Every bidder and the speaker ask for
+    the same block each round, so it is rendered once per history version (which changes
+    only on append) and window, and served from memory after that.
+    """
+    store = get_store()
+    key = (id(store), store.version(), turns, max_tokens, after_seq)
+    with _history_format_lock:
+        formatted_string = _history_format_cache.get(key)
+        if formatted_string is not None:
+            _history_format_cache.move_to_end(key)
+            return formatted_string
+
+    # Take the newest entries without reading the whole history
+    _, lines, _ = history_window(store, turns, max_tokens, after_seq)
+    formatted_string = "".join(lines) if lines else "No history found."
+
+    with _history_format_lock:
+        _history_format_cache[key] = formatted_string
+        while len(_history_format_cache) > HISTORY_FORMAT_CACHE_SIZE:
+            _history_format_cache.popitem(last=False)
     return formatted_string
 
 
@@ -89,82 +176,295 @@ def _get_groq_key():
     return key
 
 
-def agent_sim(model_LLM, plan_sys_prompt, user_query):
+def warm_up_clients():
+    """Create pooled provider clients for whichever API keys are configured."""
+    llm_clients.warm_up({
+        llm_clients.PROVIDER_ANTHROPIC: os.environ.get("ANTHROPIC_API_KEY", "").strip(),
+        llm_clients.PROVIDER_GROQ: os.environ.get("GROQ_API_KEY", "").strip(),
+    })
+
+
+# ================================== Call profiles ==================================
+# Generation settings per purpose. A bid is a two-token JSON object, a reply is ~50 words;
+# both used to get the same 2048/1024-token budget. "stop" ends generation as soon as the
+# sequence is produced; providers drop the stop sequence itself, so "close_with" puts it
+# back (a bid stops at "}" and is returned as valid JSON). timeout is seconds per request
+# attempt and max_retries the SDK's retry count (None = SDK default of 2, with backoff).
+# Bids are not retried, so a hung primary gives up after one timeout and the fallback
+# model still fits inside bidding.BID_DEADLINE_SECONDS.
+# max_tokens None keeps the provider defaults below (Claude 2048, Groq 1024).
+CALL_PROFILES = {
+    "default": {"max_tokens": None, "temperature": 1.0, "stop": None, "close_with": None, "timeout": None,
+                "max_retries": None},
+    "bid": {"max_tokens": 16, "temperature": 1.0, "stop": ["}"], "close_with": "}", "timeout": 8.0,
+            "max_retries": 0},
+    "bid_batch": {"max_tokens": 256, "temperature": 1.0, "stop": ["}"], "close_with": "}", "timeout": 10.0,
+                  "max_retries": 0},
+    "reply": {"max_tokens": 256, "temperature": 1.0, "stop": None, "close_with": None, "timeout": 60.0,
+              "max_retries": None},
+    "summary": {"max_tokens": 400, "temperature": 0.3, "stop": None, "close_with": None, "timeout": 60.0,
+                "max_retries": None},
+    "persona_extraction": {"max_tokens": 1024, "temperature": 0.2, "stop": None, "close_with": None,
+                           "timeout": 120.0, "max_retries": None},
+}
+DEFAULT_MAX_TOKENS = {"claude": 2048, "groq": 1024}
+
+
+def get_call_profile(profile):
+    """Return the settings dict for a profile name (None means "default")."""
+    name = profile or "default"
+    if name not in CALL_PROFILES:
+        raise ValueError(f"Unknown call profile: {name}. Choose from {sorted(CALL_PROFILES)}")
+    return CALL_PROFILES[name]
+
+
+def _anthropic_kwargs(model_LLM, plan_sys_prompt, user_query, settings):
+    kwargs = {
+        "model": model_LLM,
+        "max_tokens": settings["max_tokens"] or DEFAULT_MAX_TOKENS["claude"],
+        "temperature": settings["temperature"],  # Claude supports temperature
+        "system": plan_sys_prompt,  # System prompt goes here (not in messages)
+        "messages": [{"role": "user", "content": user_query}],
+    }
+    if settings["stop"]:
+        kwargs["stop_sequences"] = settings["stop"]
+    if settings["timeout"]:
+        kwargs["timeout"] = settings["timeout"]
+    return kwargs
+
+
+def _groq_kwargs(model_LLM, plan_sys_prompt, user_query, settings):
+    kwargs = {
+        "model": model_LLM,  # "llama-3.1-8b-instant", "llama-3.3-70b-versatile", ...
+        "messages": [
+            {"role": "system", "content": plan_sys_prompt},
+            {"role": "user", "content": user_query},
+        ],
+        "temperature": settings["temperature"],
+        "max_completion_tokens": settings["max_tokens"] or DEFAULT_MAX_TOKENS["groq"],
+        "top_p": 1,
+        "stream": True,
+        "stop": settings["stop"],
+    }
+    if settings["timeout"]:
+        kwargs["timeout"] = settings["timeout"]
+    return kwargs
+
+
+def _apply_close_with(text, settings):
+    """Re-append the stop sequence a profile generation was cut at (e.g. a bid's closing brace)."""
+    close_with = settings["close_with"]
+    if close_with and text is not None and not text.rstrip().endswith(close_with):
+        return text.rstrip() + close_with
+    return text
+
+
+def agent_sim(model_LLM, plan_sys_prompt, user_query, hedge=None, hedge_model=None, is_valid=None, profile=None):
+    """
+    Return the model's full response, generated with the named call profile (see CALL_PROFILES).
+    Latency is recorded per model; with hedge=True (default: LLM_HEDGE env) a second request
+    to hedge_model (default: same model) is sent once this one outlives the model's p95,
+    and the first valid response wins.
+    """
+    settings = get_call_profile(profile)
+    if hedge is None:
+        hedge = hedging.HEDGE_ENABLED
+    if hedge:
+        return hedging.hedged_call(
+            model_LLM,
+            lambda model, cancel_event: _collect_stream(model, plan_sys_prompt, user_query, cancel_event, profile),
+            hedge_model=hedge_model,
+            is_valid=is_valid,
+        )
+    started = time.monotonic()
+    response = _agent_sim_once(model_LLM, plan_sys_prompt, user_query, settings)
+    hedging.record_latency(model_LLM, time.monotonic() - started)
+    return _apply_close_with(response, settings)
+
+
+def _collect_stream(model_LLM, plan_sys_prompt, user_query, cancel_event, profile=None):
+    """
+    Join a streamed response, abandoning it once cancel_event is set. Setting the event
+    shuts the response down, so a read blocked waiting for the next token returns at once.
+    """
+    settings = get_call_profile(profile)
+    parts = []
+    stream = _stream_deltas(model_LLM, plan_sys_prompt, user_query, settings, cancel_event)
+    try:
+        for delta in stream:
+            if cancel_event.is_set():
+                raise hedging.HedgeCancelled(model_LLM)
+            parts.append(delta)
+    except Exception:
+        if cancel_event.is_set():
+            raise hedging.HedgeCancelled(model_LLM)
+        raise
+    finally:
+        stream.close()
+    return _apply_close_with("".join(parts), settings)
+
+
+def _agent_sim_once(model_LLM, plan_sys_prompt, user_query, settings):
     if model_LLM.split("-")[0] == 'claude':
-        client = anthropic.Anthropic(api_key=_get_anthropic_key())    
-        response = client.messages.create(
-            model=model_LLM,
-            max_tokens=2048,
-            temperature=1.0,  # Claude supports temperature
-            system=plan_sys_prompt,  # System prompt goes here (not in messages)
-            messages=[
-                {
-                    "role": "user",
-                    "content": user_query
-                }
-            ]
+        client = llm_clients.get_client(
+            llm_clients.PROVIDER_ANTHROPIC, _get_anthropic_key(), max_retries=settings["max_retries"]
         )
+        response = client.messages.create(**_anthropic_kwargs(model_LLM, plan_sys_prompt, user_query, settings))
         return response.content[0].text
 
     elif model_LLM.split("-")[0] in ['llama', 'meta']:
-        client = Groq(api_key=_get_groq_key())
-        completion = client.chat.completions.create(
-            model= model_LLM, #"llama-3.1-8b-instant", #"llama-3.3-70b-versatile",
-            messages=[
-                {
-                    "role": "system",
-                    "content": plan_sys_prompt  # Your system prompt here
-                },
-                {
-                "role": "user",
-                "content": user_query          
-                },
-            ],
-            temperature=1,
-            max_completion_tokens=1024,
-            top_p=1,
-            stream=True,
-            stop=None
+        return "".join(_stream_deltas(model_LLM, plan_sys_prompt, user_query, settings))
+
+
+def agent_sim_stream(model_LLM, plan_sys_prompt, user_query, profile=None):
+    """Generator of text deltas as the provider streams them (same settings as agent_sim)."""
+    yield from _stream_deltas(model_LLM, plan_sys_prompt, user_query, get_call_profile(profile))
+
+
+def _abort_response(response):
+    """
+    Stop a streamed HTTP response from another thread. Closing the socket would not wake
+    a thread blocked reading it; shutting it down does, and that thread then cleans up.
+    """
+    network_stream = response.extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is None:
+        response.close()
+        return
+    try:
+        socket.socket.shutdown(sock, socket.SHUT_RDWR)
+    except OSError:
+        pass  # already closed
+
+
+def _stream_deltas(model_LLM, plan_sys_prompt, user_query, settings, cancel_event=None):
+    """
+    Text deltas from the provider. With a hedging.CancelEvent, setting it shuts the response
+    down once the headers are in; before that the profile's timeout bounds the wait.
+    """
+    if model_LLM.split("-")[0] == 'claude':
+        client = llm_clients.get_client(
+            llm_clients.PROVIDER_ANTHROPIC, _get_anthropic_key(), max_retries=settings["max_retries"]
         )
+        with client.messages.stream(**_anthropic_kwargs(model_LLM, plan_sys_prompt, user_query, settings)) as stream:
+            if cancel_event is not None:
+                cancel_event.on_cancel(lambda: _abort_response(stream.response))
+            for text in stream.text_stream:
+                yield text
 
-        response_content = ""
+    elif model_LLM.split("-")[0] in ['llama', 'meta']:
+        client = llm_clients.get_client(
+            llm_clients.PROVIDER_GROQ, _get_groq_key(), max_retries=settings["max_retries"]
+        )
+        completion = client.chat.completions.create(**_groq_kwargs(model_LLM, plan_sys_prompt, user_query, settings))
+        if cancel_event is not None:
+            cancel_event.on_cancel(lambda: _abort_response(completion.response))
         for chunk in completion:
             chunk_content = chunk.choices[0].delta.content or ""
-            response_content += chunk_content
-            # print(chunk_content, end="")  # Optional: Still print to console if you want to see it live
-        return response_content
+            if chunk_content:
+                yield chunk_content
 
-def generate_bid_score_each_user(person_name, credits_left, model_LLM):
-    """
-    Generate bid score for a persona. Reads persona prompt and bidding prompt from config/.
+    else:
+        raise ValueError(f"Unknown model provider for: {model_LLM}")
+
+
+class SpeakerPrefixStripper:
+    r"""
+    Streaming version of the agents' cleanup `re.sub(r"^[^:\n]+\s*:\s*", "", text, count=1)`.
+    Feed deltas in order; text is held back only until we know whether the reply opens
+    with a "Name:" prefix. A prefix longer than MAX_PREFIX chars is treated as prose,
+    so a reply without a colon starts flowing after a few words instead of at the end.
     """
-    persona_prompt_path = CONFIG_DIR / f"{person_name}_persona_prompt.txt"
-    if not persona_prompt_path.exists():
-        raise FileNotFoundError(f"Persona prompt not found: {persona_prompt_path}")
-    with open(persona_prompt_path, "r", encoding="utf-8") as f:
-        persona_prompt = f.read()
+    MAX_PREFIX = 40
+
+    def __init__(self):
+        self._buffer = ""
+        self._state = "prefix"  # prefix -> space (skip whitespace after ':') -> body
+
+    def feed(self, delta):
+        """Return the part of `delta` that is safe to show now."""
+        if self._state == "body":
+            return delta
+        self._buffer += delta
+        if self._state == "prefix":
+            colon = self._buffer.find(":")
+            newline = self._buffer.find("\n")
+            if colon > 0 and (newline == -1 or colon < newline) and colon <= self.MAX_PREFIX:
+                self._buffer = self._buffer[colon + 1:]
+                self._state = "space"
+            elif newline != -1 or colon == 0 or len(self._buffer) > self.MAX_PREFIX:
+                self._state = "body"
+                out, self._buffer = self._buffer, ""
+                return out
+            else:
+                return ""
+        # state == "space"
+        stripped = self._buffer.lstrip()
+        if not stripped:
+            return ""
+        self._buffer = ""
+        self._state = "body"
+        return stripped
+
+    def finish(self):
+        """Flush whatever is still held back once the stream ends."""
+        out = self._buffer if self._state == "prefix" else self._buffer.lstrip()
+        self._buffer = ""
+        self._state = "body"
+        return out
+
+
+def build_agent_sys_prompt(person_name):
+    """System prompt for a persona's reply: persona prompt followed by the shared action prompt."""
+    return get_registry().agent_sys_prompt(person_name)
+
+
+def _build_bid_prompts(person_name, credits_left):
+    """Return (system prompt, user query) for one persona's bid."""
+    prompts = get_registry()
+    persona_prompt = prompts.persona(person_name)
     
-    conversation_hist_format = format_history_as_string(turns=10)
+    conversation_hist_format = format_history_for("bid")
     
-    bidding_prompt_path = CONFIG_DIR / "bidding_sys_prompt.txt"
-    if not bidding_prompt_path.exists():
-        raise FileNotFoundError(f"Bidding prompt not found: {bidding_prompt_path}")
-    with open(bidding_prompt_path, "r", encoding="utf-8") as f:
-        bidding_system_prompt = f.read()
+    bidding_system_prompt = prompts.get(BIDDING_PROMPT)
     
     bidding_system_prompt = bidding_system_prompt.replace("||", str(credits_left[person_name]))
     
     # bidding_system_prompt = bidding_system_prompt + "\n\n" + "Persona: " + persona_prompt + "\n\n" + "Conversation History: \n" + conversation_hist_format
     plan_sys_prompt = bidding_system_prompt
     user_query = "Persona: " + persona_prompt + "\n\n" + "Conversation History: \n" + conversation_hist_format
+    return plan_sys_prompt, user_query
+
 
-    history = []
-    history.append({"role": "user", "content": bidding_system_prompt})
-    bid_score = agent_sim(model_LLM, plan_sys_prompt, user_query) #conversation(history)        
+def _is_valid_bid(bid_score):
+    try:
+        float(json.loads(bid_score)["score"])
+        return True
+    except (ValueError, KeyError, TypeError):
+        return False
+
+
+def generate_bid_score_each_user(person_name, credits_left, model_LLM, use_cache=True):
+    """
+    Generate bid score for a persona. Persona and bidding prompts come from the prompt registry.
+    Identical inputs are answered from bid_cache unless use_cache=False or LLM_CACHE_DISABLED is set.
+    """
+    plan_sys_prompt, user_query = _build_bid_prompts(person_name, credits_left)
+    use_cache = use_cache and not cache_disabled()
+    if use_cache:
+        cache_key = make_key("bid", model_LLM, plan_sys_prompt, user_query)
+        cached = bid_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    bid_score = agent_sim(model_LLM, plan_sys_prompt, user_query, is_valid=_is_valid_bid, profile="bid") #conversation(history)        
     # bid_scores[person_name] = bid_score
+    # Only well-formed bids are cached, so a malformed answer is retried next time
+    if use_cache and _is_valid_bid(bid_score):
+        bid_cache.put(cache_key, bid_score)
 
     return bid_score
 
+
     # bid_scores = {}
     # for person_name, person_role in person_role_dict.items():
     #     with open(f"{person_name}_persona_prompt.txt", "r") as f:
@@ -187,3 +487,102 @@ def generate_bid_score_each_user(person_name, credits_left, model_LLM):
     #     bid_scores[person_name] = bid_score
 
     # return bid_scores
+
+
+def _build_batch_bid_prompts(person_names, credits_left):
+    """Return (system prompt, user query) scoring all `person_names` in one call; history is sent once."""
+    prompts = get_registry()
+    plan_sys_prompt = prompts.get(BATCH_BIDDING_PROMPT)
+
+    persona_blocks = []
+    for person_name in person_names:
+        persona_prompt = prompts.persona(person_name)
+        persona_blocks.append(
+            f"Persona id: {person_name} (credits left: {credits_left[person_name]})\n{persona_prompt.strip()}"
+        )
+
+    conversation_hist_format = format_history_for("bid_batch")
+    user_query = "Personas:\n\n" + "\n\n".join(persona_blocks) + "\n\n" + "Conversation History: \n" + conversation_hist_format
+    return plan_sys_prompt, user_query
+
+
+def parse_batch_bid_scores(response, person_names):
+    """
+    Parse a batched bid response into {person_name: score}. Personas that are missing or
+    have a non-numeric score are left out, so the caller can re-bid them individually.
+    """
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        raw = json.loads(response[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(raw, dict):
+        return {}
+    scores = {}
+    for person_name in person_names:
+        try:
+            score = float(raw[person_name])
+        except (KeyError, TypeError, ValueError):
+            continue
+        scores[person_name] = min(100.0, max(0.0, score))
+    return scores
+
+
+def generate_bid_scores_batch(person_names, credits_left, model_LLM, use_cache=True):
+    """
+    Score every persona in `person_names` with a single LLM call.
+    Returns {person_name: score 0-100} for the personas the model answered for.
+    """
+    plan_sys_prompt, user_query = _build_batch_bid_prompts(person_names, credits_left)
+    use_cache = use_cache and not cache_disabled()
+    if use_cache:
+        cache_key = make_key("bid_batch", model_LLM, plan_sys_prompt, user_query)
+        cached = bid_cache.get(cache_key)
+        if cached is not None:
+            return parse_batch_bid_scores(cached, person_names)
+    response = agent_sim(model_LLM, plan_sys_prompt, user_query, profile="bid_batch")
+    scores = parse_batch_bid_scores(response, person_names)
+    if use_cache and len(scores) == len(person_names):
+        bid_cache.put(cache_key, response)
+    return scores
+
+
+# ================================== Async variants ==================================
+# Same prompts and models as above, on the providers' async clients, so the server can
+# drive many simulations from one event loop without a thread per in-flight call.
+
+async def agent_sim_stream_async(model_LLM, plan_sys_prompt, user_query, profile=None):
+    """Async iterator of text deltas from the model, in arrival order."""
+    settings = get_call_profile(profile)
+    if model_LLM.split("-")[0] == 'claude':
+        client = llm_clients.get_async_client(
+            llm_clients.PROVIDER_ANTHROPIC, _get_anthropic_key(), max_retries=settings["max_retries"]
+        )
+        async with client.messages.stream(**_anthropic_kwargs(model_LLM, plan_sys_prompt, user_query, settings)) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+    elif model_LLM.split("-")[0] in ['llama', 'meta']:
+        client = llm_clients.get_async_client(
+            llm_clients.PROVIDER_GROQ, _get_groq_key(), max_retries=settings["max_retries"]
+        )
+        completion = await client.chat.completions.create(
+            **_groq_kwargs(model_LLM, plan_sys_prompt, user_query, settings)
+        )
+        async for chunk in completion:
+            chunk_content = chunk.choices[0].delta.content or ""
+            if chunk_content:
+                yield chunk_content
+
+    else:
+        raise ValueError(f"Unknown model provider for: {model_LLM}")
+
+
+async def agent_sim_async(model_LLM, plan_sys_prompt, user_query, profile=None):
+    """Async counterpart of agent_sim: returns the full response text."""
+    parts = []
+    async for delta in agent_sim_stream_async(model_LLM, plan_sys_prompt, user_query, profile):
+        parts.append(delta)
+    return _apply_close_with("".join(parts), get_call_profile(profile))
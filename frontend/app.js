@@ -314,26 +314,119 @@
     container.appendChild(messageRow);
     container.scrollTop = container.scrollHeight;
     if (playSound) playChime();
+    return messageRow;
+  }
+
+  // Replies being streamed token by token (message_start / chunk), keyed by speaker.
+  // When the finished line arrives (message_end or the history "message" event) the live
+  // row is replaced by a regular message, so reactions key off the final content.
+  const liveMessages = {};
+  const finalizedLive = {};
+
+  function startLiveMessage(container, role) {
+    if (liveMessages[role]) liveMessages[role].row.remove();
+    const row = appendOneMessage(container, role, '', new Date().toISOString(), false);
+    row.classList.add('message-streaming');
+    liveMessages[role] = { row: row, text: '' };
+  }
+
+  function appendLiveChunk(container, role, delta) {
+    if (!liveMessages[role]) startLiveMessage(container, role);
+    const live = liveMessages[role];
+    live.text += delta || '';
+    live.row.querySelector('.message-bubble').textContent = escapeHtml(live.text);
+    container.scrollTop = container.scrollHeight;
+  }
+
+  function finishLiveMessage(container, role, content, timestamp) {
+    const live = liveMessages[role];
+    if (!live) return false;
+    live.row.remove();
+    delete liveMessages[role];
+    appendOneMessage(container, role, content, timestamp, true);
+    finalizedLive[role] = content;
+    return true;
+  }
+
+  function handleStreamEvent(container, ev) {
+    if (ev.type === 'message_start') {
+      startLiveMessage(container, ev.speaker);
+    } else if (ev.type === 'chunk') {
+      appendLiveChunk(container, ev.speaker, ev.delta);
+    } else if (ev.type === 'message_end') {
+      finishLiveMessage(container, ev.speaker, ev.text, ev.timestamp || new Date().toISOString());
+    } else if (ev.type === 'message' && (ev.role || ev.content)) {
+      const timestamp = ev.timestamp || null;
+      if (finishLiveMessage(container, ev.role, ev.content, timestamp)) return;
+      if (finalizedLive[ev.role] === ev.content) {
+        // Already shown from the live stream
+        delete finalizedLive[ev.role];
+        return;
+      }
+      appendOneMessage(container, ev.role, ev.content, timestamp, true);
+    }
   }
 
   function renderAll(container, messages) {
     if (!messages || messages.length === 0) return;
     let lastTimestamp = null;
     messages.forEach(function (m) {
-      const timestamp = m.timestamp || new Date().toISOString();
-      const date = new Date(timestamp);
-      const dateStr = date.toDateString();
-      if (lastTimestamp && new Date(lastTimestamp).toDateString() !== dateStr) {
+      // Timestamps are stamped when the line is written; very old lines have none
+      const timestamp = m.timestamp || null;
+      if (timestamp && lastTimestamp && new Date(lastTimestamp).toDateString() !== new Date(timestamp).toDateString()) {
         const divider = document.createElement('div');
         divider.className = 'timestamp-divider';
         divider.textContent = formatTimestamp(timestamp);
         container.appendChild(divider);
       }
       appendOneMessage(container, m.role || m.speaker, m.content || m.text, timestamp, false);
-      lastTimestamp = timestamp;
+      if (timestamp) lastTimestamp = timestamp;
     });
   }
 
+  // History is paged by sequence id: the latest page loads first, older pages on scroll-up.
+  const HISTORY_PAGE_SIZE = 50;
+  const LOAD_OLDER_THRESHOLD_PX = 80;
+  let olderCursor = null;
+  let loadingOlder = false;
+
+  function prependOlder(container, messages) {
+    const holder = document.createElement('div');
+    renderAll(holder, messages);
+    const previousHeight = container.scrollHeight;
+    const fragment = document.createDocumentFragment();
+    while (holder.firstChild) fragment.appendChild(holder.firstChild);
+    container.insertBefore(fragment, container.firstChild);
+    // Keep the messages the user was looking at in place
+    container.scrollTop += container.scrollHeight - previousHeight;
+  }
+
+  function loadOlderMessages(container) {
+    if (loadingOlder || olderCursor === null) return;
+    loadingOlder = true;
+    get('/api/history?limit=' + HISTORY_PAGE_SIZE + '&before=' + olderCursor)
+      .then(function (data) {
+        olderCursor = data.next_cursor;
+        prependOlder(container, data.messages || []);
+      })
+      .catch(function (err) {
+        console.error('Loading older messages failed:', err);
+      })
+      .then(function () {
+        loadingOlder = false;
+        fillViewport(container);
+      });
+  }
+
+  // A page that does not overflow the container never fires scroll, so keep loading
+  function fillViewport(container) {
+    if (container.scrollHeight <= container.clientHeight) loadOlderMessages(container);
+  }
+
+  function onWorldChatScroll(e) {
+    if (e.target.scrollTop < LOAD_OLDER_THRESHOLD_PX) loadOlderMessages(e.target);
+  }
+
   function switchTab(tabName) {
     activeTab = tabName;
     tabs.forEach(function (tab) {
@@ -353,14 +446,19 @@
 
   function loadWorldChat(container) {
     container.innerHTML = 'Loading…';
-    get('/api/history')
+    olderCursor = null;
+    container.removeEventListener('scroll', onWorldChatScroll);
+    get('/api/history?limit=' + HISTORY_PAGE_SIZE)
       .then(function (data) {
         const messages = (data && data.messages) || [];
+        olderCursor = data.next_cursor;
+        container.addEventListener('scroll', onWorldChatScroll);
         container.innerHTML = '';
         if (messages.length === 0) {
           container.innerHTML = '<p class="empty-msg">Waiting for messages… run.py is writing to conversational_history.txt.</p>';
         } else {
           renderAll(container, messages);
+          fillViewport(container);
         }
         // Stream new lines as they appear
         if (evtSource) {
@@ -371,10 +469,7 @@
           const empty = container.querySelector('.empty-msg');
           if (empty) empty.remove();
           try {
-            const ev = JSON.parse(e.data);
-            if (ev.type === 'message' && (ev.role || ev.content)) {
-              appendOneMessage(container, ev.role, ev.content, ev.timestamp || new Date().toISOString(), true);
-            }
+            handleStreamEvent(container, JSON.parse(e.data));
           } catch (err) {}
         };
         evtSource.onerror = function () {
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cold-segment history archive (backend/history_archive.py).
+
+Builds a synthetic segment from the messages in data/conversational_history.txt
+(repeated with varying numbers), then for several block sizes reports the compression
+ratio, archive time and the latency of reading a random page of old history, against
+the plain JSONL segment and a whole-file gzip (best ratio, no random access).
+Usage: python scripts/bench_history_archive.py [--messages 20000] [--page 50] [--reads 300]
+"""
+
+import argparse
+import gzip
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "backend"))
+
+import history_archive  # noqa: E402
+from history_segments import SegmentedHistoryStore  # noqa: E402
+from history_store import HISTORY_FILE, HistoryStore  # noqa: E402
+
+BLOCK_SIZES = (16, 64, 256, 1024)
+
+
+def build_segment(directory, n_messages):
+    """A sealed plain segment of n_messages lines; returns (store, segment record)."""
+    sample = HistoryStore(HISTORY_FILE).all() or [{"role": "Gaurav", "content": "Hello there!"}]
+    store = SegmentedHistoryStore(directory, segment_bytes=1 << 40)
+    with store._lock, store._locked():
+        for i in range(n_messages):
+            entry = sample[i % len(sample)]
+            store._append_locked(entry["role"], f"[{i}] {entry['content']}")
+        store._seal_active()
+    return store, store.sealed[0]
+
+
+def page_latencies(read, last_seq, page, reads):
+    rng = random.Random(0)
+    times = []
+    for _ in range(reads):
+        first = rng.randint(1, max(1, last_seq - page + 1))
+        started = time.perf_counter()
+        entries = read(first, first + page - 1)
+        times.append((time.perf_counter() - started) * 1000)
+        assert len(entries) == min(page, last_seq - first + 1)
+    times.sort()
+    return statistics.median(times), times[int(0.95 * (len(times) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--page", type=int, default=50, help="Messages per history page read")
+    parser.add_argument("--reads", type=int, default=300, help="Random page reads per variant")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_history_"))
+    try:
+        store, seg = build_segment(tmp, args.messages)
+        plain_path = tmp / seg["file"]
+        raw = plain_path.read_bytes()
+        print(f"Segment: {args.messages} messages, {len(raw) / 1e6:.2f} MB plain JSONL; page = {args.page} messages\n")
+        print(f"{'variant':<22}{'size MB':>9}{'ratio':>8}{'build s':>9}{'page p50 ms':>13}{'page p95 ms':>13}")
+
+        p50, p95 = page_latencies(lambda a, b: store._read_sealed(seg, a, b), seg["last_seq"], args.page, args.reads)
+        print(f"{'plain jsonl':<22}{len(raw) / 1e6:>9.2f}{1.0:>8.2f}{0.0:>9.2f}{p50:>13.3f}{p95:>13.3f}")
+
+        started = time.perf_counter()
+        whole = gzip.compress(raw, compresslevel=history_archive.ARCHIVE_COMPRESS_LEVEL)
+        build = time.perf_counter() - started
+
+        def read_whole(a, b):
+            lines = [line for line in gzip.decompress(whole).split(b"\n") if line.strip()]
+            return lines[a - 1:b]
+
+        p50, p95 = page_latencies(read_whole, seg["last_seq"], args.page, max(1, args.reads // 10))
+        print(f"{'whole-file gzip':<22}{len(whole) / 1e6:>9.2f}{len(raw) / len(whole):>8.2f}{build:>9.2f}"
+              f"{p50:>13.3f}{p95:>13.3f}")
+
+        for block_messages in BLOCK_SIZES:
+            record = dict(seg)
+            started = time.perf_counter()
+            history_archive.archive_segment(tmp, record, block_messages=block_messages)
+            build = time.perf_counter() - started
+            size = record["archive"]["bytes"]
+            p50, p95 = page_latencies(lambda a, b: history_archive.read_archived(tmp, record, a, b),
+                                      seg["last_seq"], args.page, args.reads)
+            label = f"gzip blocks of {block_messages}"
+            print(f"{label:<22}{size / 1e6:>9.2f}{len(raw) / size:>8.2f}{build:>9.2f}{p50:>13.3f}{p95:>13.3f}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Malformed bid answers must not open the primary model's circuit breaker.
+Run from the repo root: python -m pytest tests
+"""
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "backend"))
+
+import bidding  # noqa: E402
+import circuit_breaker  # noqa: E402
+import utils  # noqa: E402
+
+PRIMARY = "test-primary"
+FALLBACK = "test-fallback"
+
+
+def _fresh_breakers(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+
+
+def test_malformed_bids_fall_back_without_opening_the_breaker(monkeypatch):
+    _fresh_breakers(monkeypatch)
+    answers = {PRIMARY: "not json", FALLBACK: '{"score": 50}'}
+    monkeypatch.setattr(utils, "generate_bid_score_each_user", lambda person, credits, model: answers[model])
+    credits = {"p": 100}
+    for _ in range(circuit_breaker.BREAKER_FAILURE_THRESHOLD + 1):
+        assert bidding.bid_for_person("p", credits, PRIMARY, FALLBACK) == 50
+    primary = circuit_breaker.get_breaker(PRIMARY)
+    assert primary.state == circuit_breaker.STATE_CLOSED
+    assert primary.total_failures == 0
+
+
+def test_provider_errors_still_open_the_breaker(monkeypatch):
+    _fresh_breakers(monkeypatch)
+
+    def generate(person, credits, model):
+        if model == PRIMARY:
+            raise ConnectionError("provider down")
+        return '{"score": 50}'
+
+    monkeypatch.setattr(utils, "generate_bid_score_each_user", generate)
+    for _ in range(circuit_breaker.BREAKER_FAILURE_THRESHOLD):
+        bidding.bid_for_person("p", {"p": 100}, PRIMARY, FALLBACK)
+    assert circuit_breaker.get_breaker(PRIMARY).state == circuit_breaker.STATE_OPEN
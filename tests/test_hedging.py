@@ -0,0 +1,47 @@
+"""
+Hedged-request cancellation: the loser must be woken by its cancel event, not by its next token.
+Run from the repo root: python -m pytest tests
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "backend"))
+
+import hedging  # noqa: E402
+
+
+def test_cancel_event_runs_callbacks_once():
+    event = hedging.CancelEvent()
+    calls = []
+    event.on_cancel(lambda: calls.append("registered before"))
+    event.set()
+    event.set()
+    event.on_cancel(lambda: calls.append("registered after"))
+    assert calls == ["registered before", "registered after"]
+
+
+def test_blocked_loser_frees_its_worker(monkeypatch):
+    monkeypatch.setattr(hedging, "_trackers", {})
+    for _ in range(hedging.MIN_SAMPLES):
+        hedging.record_latency("slow", 0.05)
+    finished = {}
+
+    def fn(model, cancel_event):
+        if model == "slow":
+            # Stands in for a read blocked before the first token: only the callback unblocks it
+            unblocked = threading.Event()
+            cancel_event.on_cancel(unblocked.set)
+            unblocked.wait(timeout=10)
+            finished[model] = time.monotonic()
+            raise hedging.HedgeCancelled(model)
+        return "answer"
+
+    started = time.monotonic()
+    assert hedging.hedged_call("slow", fn, hedge_model="fast") == "answer"
+    deadline = time.monotonic() + 2
+    while "slow" not in finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert finished["slow"] - started < 2
@@ -0,0 +1,48 @@
+"""
+Local (BID_MODE=local) bidding on a fresh conversation.
+Run from the repo root: python -m pytest tests
+"""
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "backend"))
+
+import bidding  # noqa: E402
+import local_bidder  # noqa: E402
+import utils  # noqa: E402
+from agent import PERSON_ROLE  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+
+
+class _NoSummary:
+    def prefix(self):
+        return "", 0
+
+
+def _fresh_history(tmp_path, monkeypatch):
+    store = HistoryStore(tmp_path / "history.txt")
+    # The seed line simulation_stream writes into an empty history
+    store.append("Gaurav", "Conversation started.")
+    monkeypatch.setattr(utils, "get_store", lambda *args, **kwargs: store)
+    monkeypatch.setattr(utils, "get_memory", lambda: _NoSummary())
+    return store
+
+
+def test_cold_start_scores_content_not_speaker(tmp_path, monkeypatch):
+    _fresh_history(tmp_path, monkeypatch)
+    text = utils.history_content_for("bid")
+    assert text == "Conversation started."
+    scores = local_bidder.get_bidder().scores(text, list(PERSON_ROLE))
+    # No overlap with any persona: everyone gets the floor score, the last speaker included
+    assert set(scores.values()) == {local_bidder.LOCAL_MIN_SCORE}
+
+
+def test_cold_start_lets_someone_else_speak(tmp_path, monkeypatch):
+    _fresh_history(tmp_path, monkeypatch)
+    credits = {person: 100 for person in PERSON_ROLE}
+    bids = bidding.collect_bids(list(PERSON_ROLE), credits, mode=bidding.BID_MODE_LOCAL)
+    others = {person: bid for person, bid in bids.items() if PERSON_ROLE[person] != "Gaurav"}
+    assert max(others.values()) > 0
+    # Scores are absolute, so no winner bids its whole balance
+    assert all(bid < credits[person] for person, bid in bids.items())